@@ -1,7 +1,7 @@
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, GLib, Gio, Gdk, Adw
+from gi.repository import Gtk, GLib, Gio, Gdk, Adw, GObject
 import subprocess
 import os
 import threading
@@ -10,12 +10,25 @@ import requests
 import time
 import sys
 import shutil
+import json
+import gzip
+import glob
+import queue
+import re
+import shlex
+import stat
+import heapq
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import xml.etree.ElementTree as ElementTree
 from packaging import version
 
 # Versión actual de la aplicación
 CURRENT_VERSION = "11.0"  # Esto se cambia según haya una nueva release
 GITHUB_REPO = "InledGroup/appinstall"
 
+# Directorio de caché propio de la aplicación
+APP_CACHE_DIR = os.path.expanduser("~/.cache/appinstall")
+
 import locale
 import gettext
 
@@ -53,10 +66,503 @@ def setup_icon_theme():
     except Exception as e:
         print(f"Advertencia al configurar tema de iconos: {e}")
 
-class PackageManager:
+def get_files_signature(paths):
+    """Devuelve la firma (ruta, mtime, tamaño) de una lista de archivos para detectar cambios."""
+    signature = []
+    for path in sorted(paths):
+        try:
+            st = os.stat(path)
+            signature.append([path, st.st_mtime_ns, st.st_size])
+        except OSError:
+            pass  # Archivo eliminado mientras leíamos
+    return signature
+
+class CacheFile:
+    """Archivo JSON de ~/.cache/appinstall ligado a una versión de formato y a una firma.
+
+    La firma describe los datos de origen (por ejemplo la de get_files_signature):
+    si no coincide con la guardada, el contenido se descarta. Se escribe en un
+    archivo temporal que luego se renombra, así nunca queda un JSON a medias.
+    """
+    def __init__(self, filename, version, description):
+        self.path = os.path.join(APP_CACHE_DIR, filename)
+        self.version = version
+        self.description = description
+
+    def load(self, signature):
+        """Devuelve el contenido guardado o None si falta o no corresponde a la firma."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('version') != self.version or cached.get('signature') != signature:
+                return None
+            return cached['entries']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, signature, entries):
+        try:
+            os.makedirs(APP_CACHE_DIR, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.version, 'signature': signature, 'entries': entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"No se pudo guardar {self.description}: {e}")
+
+def iter_control_stanzas(path, fields=None):
+    """Lee un archivo con formato de control de Debian (Packages, status...) párrafo a párrafo.
+
+    Solo se guarda la primera línea de cada campo; las líneas de continuación
+    (como la descripción larga) se descartan.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    stanza = {}
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if not line.strip():
+                if stanza:
+                    yield stanza
+                    stanza = {}
+                continue
+            if line[0] in ' \t':
+                continue
+            key, sep, value = line.partition(':')
+            if sep and (fields is None or key in fields):
+                stanza[key] = value.strip()
+    if stanza:
+        yield stanza
+
+# Separadores habituales dentro de los nombres de paquete (vlc-plugin-base, python3.11...)
+PACKAGE_NAME_TOKEN_RE = re.compile(r'[-_.+:]')
+
+def score_search_result(result, query, installed=frozenset()):
+    """Puntúa la relevancia de un resultado de búsqueda para la consulta dada."""
+    name = result['name'].lower()
+    q = query.lower()
+    if name == q:
+        score = 1000
+    elif name.startswith(q):
+        # Entre los que empiezan igual, mejor cuanto más corto sea el nombre
+        score = 800 - min(len(name) - len(q), 100)
+    else:
+        tokens = PACKAGE_NAME_TOKEN_RE.split(name)
+        if q in tokens:
+            score = 600
+        elif any(token.startswith(q) for token in tokens):
+            score = 500
+        elif q in name:
+            score = 400
+        elif q in result['desc'].lower():
+            score = 200
+        else:
+            score = 0
+    if result['name'] in installed:
+        score += 50
+    return score
+
+def rank_search_results(results, query, installed=frozenset()):
+    """Ordena los resultados por relevancia (el orden original desempata)."""
+    return sorted(results, key=lambda r: score_search_result(r, query, installed), reverse=True)
+
+class PackageIndex:
+    """Índice local de búsqueda construido a partir de los metadatos del repositorio.
+
+    Se guarda en ~/.cache/appinstall y solo se reconstruye cuando cambian los
+    metadatos, así la búsqueda no necesita lanzar apt-cache/dnf en cada consulta.
+    """
+    FORMAT_VERSION = 1
+    CHECK_INTERVAL = 30  # Segundos entre comprobaciones de cambios en los metadatos
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.cache = CacheFile(f"package_index_{manager.index_name}.json", self.FORMAT_VERSION,
+                               "el índice de paquetes")
+        self.lock = threading.Lock()
+        self.building = False
+        self.last_check = 0
+        self.signature = None
+        # (nombres, descripciones, nombres en minúsculas, descripciones en minúsculas)
+        self.data = None
+
+    def refresh_async(self):
+        """Carga o reconstruye el índice en segundo plano si hace falta."""
+        with self.lock:
+            if self.building:
+                return
+            self.building = True
+            self.last_check = time.time()
+        thread = threading.Thread(target=self._refresh)
+        thread.daemon = True
+        thread.start()
+
+    def _refresh(self):
+        try:
+            signature = get_files_signature(self.manager.get_index_sources())
+            if not signature or signature == self.signature:
+                return
+            if self.data is None:
+                cached = self.cache.load(signature)
+                if cached is not None:
+                    self._set_entries(cached, signature)
+                    return
+
+            entries = {}
+            for name, desc in self.manager.read_index_entries():
+                if name and name not in entries:
+                    entries[name] = desc
+            self._set_entries(list(entries.items()), signature)
+            self.cache.save(signature, list(entries.items()))
+            print(f"DEBUG: Índice de paquetes reconstruido ({len(entries)} paquetes)")
+        except Exception as e:
+            print(f"Error construyendo el índice de paquetes: {e}")
+        finally:
+            self.building = False
+
+    def _set_entries(self, entries, signature):
+        names = [name for name, _desc in entries]
+        descs = [desc for _name, desc in entries]
+        self.data = (names, descs, [n.lower() for n in names], [d.lower() for d in descs])
+        self.signature = signature
+
     def search(self, query):
+        """Busca en el índice. Devuelve None si todavía no está disponible."""
+        if time.time() - self.last_check > self.CHECK_INTERVAL:
+            self.refresh_async()
+        data = self.data
+        if data is None:
+            return None
+
+        names, descs, names_lower, descs_lower = data
+        q = query.lower()
+        source = self.manager.index_name
+        matches = [{'name': names[i], 'desc': descs[i], 'source': source}
+                   for i, name in enumerate(names_lower) if q in name or q in descs_lower[i]]
+        return rank_search_results(matches, query)
+
+# Catálogos AppStream: (patrón de los catálogos, carpeta de iconos en caché)
+APPSTREAM_CATALOGS = (
+    ("/usr/share/swcatalog/xml/*.xml.gz", "/usr/share/swcatalog/icons"),
+    ("/usr/share/app-info/xmls/*.xml.gz", "/usr/share/app-info/icons"),
+    ("/var/lib/swcatalog/yaml/*.yml.gz", "/var/lib/swcatalog/icons"),
+    ("/var/lib/app-info/yaml/*.yml.gz", "/var/lib/app-info/icons"),
+)
+
+class AppStreamCatalog:
+    """Índice del catálogo AppStream de la distribución.
+
+    Relaciona cada paquete con su nombre visible, su resumen y su icono. Se
+    construye una sola vez a partir de los catálogos comprimidos y se guarda
+    en ~/.cache/appinstall, así las filas solo hacen búsquedas en memoria.
+    """
+    FORMAT_VERSION = 1
+    ICON_SIZES = ("64x64", "128x128", "48x48", "64x64@2")
+
+    def __init__(self, catalogs=APPSTREAM_CATALOGS):
+        self.catalogs = catalogs
+        self.cache = CacheFile("appstream_index.json", self.FORMAT_VERSION, "el índice AppStream")
+        self.lock = threading.Lock()
+        self.building = False
+        self.signature = None
+        # paquete -> [nombre, resumen, ruta del icono o None, icono del tema o None]
+        self.entries = {}
+        # Funciones a las que se avisa en el hilo principal cuando cambia el índice
+        self.listeners = []
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def _set_entries(self, entries, signature):
+        self.entries = entries
+        self.signature = signature
+        for callback in list(self.listeners):
+            GLib.idle_add(callback)
+
+    def get_sources(self):
+        sources = []
+        for pattern, icons_dir in self.catalogs:
+            sources.extend((path, icons_dir) for path in sorted(glob.glob(pattern)))
+        return sources
+
+    def refresh_async(self):
+        """Carga o reconstruye el índice en segundo plano si hace falta."""
+        with self.lock:
+            if self.building:
+                return
+            self.building = True
+        thread = threading.Thread(target=self._refresh)
+        thread.daemon = True
+        thread.start()
+
+    def _refresh(self):
+        try:
+            sources = self.get_sources()
+            signature = get_files_signature([path for path, _icons_dir in sources])
+            if not signature or signature == self.signature:
+                return
+            cached = self.cache.load(signature)
+            if cached is not None:
+                self._set_entries(cached, signature)
+                return
+
+            entries = {}
+            for path, icons_dir in sources:
+                try:
+                    if path.endswith(".xml.gz"):
+                        components = self.read_xml_catalog(path)
+                    else:
+                        components = self.read_yaml_catalog(path)
+                    for origin, component in components:
+                        pkgname = component.get('pkgname')
+                        if not pkgname or pkgname in entries:
+                            continue
+                        entries[pkgname] = [
+                            component.get('name') or pkgname,
+                            component.get('summary') or "",
+                            self.resolve_icon(icons_dir, origin, component.get('cached_icons', [])),
+                            component.get('stock_icon'),
+                        ]
+                except Exception as e:
+                    print(f"Error leyendo el catálogo AppStream {path}: {e}")
+            self._set_entries(entries, signature)
+            self.cache.save(signature, entries)
+            print(f"DEBUG: Catálogo AppStream indexado ({len(entries)} paquetes)")
+        except Exception as e:
+            print(f"Error construyendo el índice AppStream: {e}")
+        finally:
+            self.building = False
+
+    @staticmethod
+    def read_xml_catalog(path):
+        """Recorre un catálogo AppStream XML sin cargarlo entero en memoria."""
+        origin = ""
+        with gzip.open(path, 'rb') as f:
+            for event, elem in ElementTree.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    if elem.tag == "components":
+                        origin = elem.get("origin", "")
+                    continue
+                if elem.tag != "component":
+                    continue
+
+                component = {'cached_icons': []}
+                for child in elem:
+                    localized = "{http://www.w3.org/XML/1998/namespace}lang" in child.attrib
+                    if child.tag == "pkgname":
+                        component['pkgname'] = (child.text or "").strip()
+                    elif child.tag == "name" and not localized:
+                        component['name'] = (child.text or "").strip()
+                    elif child.tag == "summary" and not localized:
+                        component['summary'] = (child.text or "").strip()
+                    elif child.tag == "icon":
+                        icon_type = child.get("type")
+                        if icon_type == "cached":
+                            size = f"{child.get('width', '64')}x{child.get('height', '64')}"
+                            if child.get("scale", "1") != "1":
+                                size += f"@{child.get('scale')}"
+                            component['cached_icons'].append((size, (child.text or "").strip()))
+                        elif icon_type == "stock":
+                            component['stock_icon'] = (child.text or "").strip()
+                elem.clear()
+                yield origin, component
+
+    @staticmethod
+    def read_yaml_catalog(path):
+        """Lee un catálogo DEP-11 (YAML) con un analizador mínimo de los campos necesarios."""
+        origin = ""
+        component = None
+        section = None
+        icon_group = None
+        icon_size = None
+        icon_name = None
+
+        def finish(component):
+            if component and icon_name is not None and icon_size is not None:
+                component['cached_icons'].append((icon_size, icon_name))
+
+        with gzip.open(path, 'rt', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if line.startswith("---"):
+                    finish(component)
+                    if component is not None:
+                        yield origin, component
+                    component = {'cached_icons': []}
+                    section = icon_group = None
+                    icon_size = icon_name = None
+                    continue
+                if component is None or not line.strip():
+                    continue
+
+                if not line.startswith(" "):
+                    # Clave de primer nivel
+                    key, _sep, value = line.partition(":")
+                    value = value.strip().strip("'\"")
+                    section = key
+                    if key == "Origin":
+                        origin = value
+                    elif key == "Package":
+                        component['pkgname'] = value
+                    continue
+
+                stripped = line.strip()
+                if section in ("Name", "Summary") and stripped.startswith("C:"):
+                    component[section.lower()] = stripped[2:].strip().strip("'\"")
+                elif section == "Icon":
+                    if stripped.endswith(":") and not stripped.startswith("-"):
+                        # Subsección: cached, remote...
+                        finish(component)
+                        icon_group = stripped[:-1]
+                        icon_size = icon_name = None
+                    elif stripped.startswith("stock:"):
+                        component['stock_icon'] = stripped[6:].strip()
+                    elif icon_group != "cached":
+                        continue
+                    elif stripped.startswith("- name:") or stripped.startswith("name:"):
+                        finish(component)
+                        icon_name = stripped.split(":", 1)[1].strip()
+                        icon_size = None
+                    elif stripped.startswith("width:") and icon_name is not None:
+                        icon_size = f"{stripped[6:].strip()}x{stripped[6:].strip()}"
+                    elif stripped.startswith("scale:") and icon_size and stripped[6:].strip() != "1":
+                        icon_size += f"@{stripped[6:].strip()}"
+
+        finish(component)
+        if component is not None and component.get('pkgname'):
+            yield origin, component
+
+    def resolve_icon(self, icons_dir, origin, cached_icons):
+        """Devuelve la ruta del icono en caché que exista, prefiriendo 64x64."""
+        by_size = dict(cached_icons)
+        for size in self.ICON_SIZES + tuple(by_size):
+            name = by_size.get(size)
+            if not name:
+                continue
+            path = os.path.join(icons_dir, origin, size, name)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def lookup(self, package):
+        """Devuelve (nombre, resumen, ruta del icono, icono del tema) o None."""
+        return self.entries.get(package)
+
+appstream_catalog = AppStreamCatalog()
+
+# Tiempo máximo que esperamos a cada origen de búsqueda (en segundos)
+SEARCH_DEADLINES = {
+    'system': 30,
+    'brew': 10,
+}
+
+# Número de resultados que se muestran tras ordenarlos por relevancia
+SEARCH_RESULT_LIMIT = 15
+# Número de candidatos que se piden a cada origen antes de ordenarlos
+SEARCH_CANDIDATE_LIMIT = 200
+
+def stream_command_lines(cmd, timeout, spawn=subprocess.Popen):
+    """Lanza un comando y devuelve sus líneas de salida a medida que llegan.
+
+    spawn lanza el proceso; el planificador de búsquedas lo usa para poder
+    terminarlo si la búsqueda queda obsoleta. Si se deja de leer antes de
+    tiempo (por ejemplo al alcanzar un límite de resultados) el proceso se
+    termina en lugar de esperar a que vuelque toda su salida.
+    """
+    process = spawn(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    timed_out = threading.Event()
+
+    def on_timeout():
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, on_timeout)
+    timer.daemon = True
+    timer.start()
+    try:
+        for raw_line in process.stdout:
+            yield raw_line.decode('utf-8', errors='ignore')
+        process.wait()
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        if process.returncode < 0:
+            raise SearchCancelled()
+    finally:
+        timer.cancel()
+        if process.poll() is None:
+            process.terminate()
+            process.wait()
+        process.stdout.close()
+
+class PackageManager:
+    # Nombre del índice local de búsqueda (None si el gestor no tiene índice)
+    index_name = None
+
+    def __init__(self):
+        self.index = PackageIndex(self) if self.index_name else None
+        self.installed_lock = threading.Lock()
+        self.installed_cache = None
+        self.installed_signature = None
+
+    def search(self, query, spawn=subprocess.Popen, limit=None):
+        """Busca primero en el índice local y, si aún no está listo, en el gestor de paquetes.
+
+        spawn permite lanzar el proceso de búsqueda de forma que se pueda cancelar.
+        Devuelve (resultados, completos): el índice devuelve todas las
+        coincidencias, mientras que la búsqueda en vivo se corta en limit.
+        """
+        if self.index:
+            results = self.index.search(query)
+            if results is not None:
+                return results, True
+        results = self.search_live(query, spawn, limit)
+        return results, limit is None or len(results) < limit
+    def search_live(self, query, spawn=subprocess.Popen, limit=None):
+        """Lee los resultados en streaming y corta el proceso al llegar al límite."""
+        results = []
+        stream = self.iter_search_live(query, spawn)
+        try:
+            for result in stream:
+                results.append(result)
+                if limit is not None and len(results) >= limit:
+                    break
+        except SearchCancelled:
+            raise
+        except Exception as e:
+            print(f"Error en la búsqueda de paquetes: {e}")
+        finally:
+            stream.close()
+        return results
+    def iter_search_live(self, query, spawn=subprocess.Popen):
+        raise NotImplementedError()
+    def get_index_sources(self):
+        raise NotImplementedError()
+    def read_index_entries(self):
         raise NotImplementedError()
     def list_installed(self):
+        return list(self.list_installed_details())
+    def list_installed_details(self):
+        """Paquetes instalados: nombre -> {'version', 'arch', 'size', 'desc'}.
+
+        El resultado se guarda hasta que cambian los archivos de la base de
+        datos de paquetes, así que repetir la consulta no cuesta nada.
+        """
+        try:
+            signature = get_files_signature(self.get_installed_sources())
+            with self.installed_lock:
+                if self.installed_cache is None or signature != self.installed_signature:
+                    self.installed_cache = self.read_installed()
+                    self.installed_signature = signature
+                return self.installed_cache
+        except Exception as e:
+            print(f"Error al leer los paquetes instalados: {e}")
+            return {}
+    def get_installed_sources(self):
+        raise NotImplementedError()
+    def read_installed(self):
         raise NotImplementedError()
     def install(self, package):
         raise NotImplementedError()
@@ -66,12 +572,24 @@ class PackageManager:
         raise NotImplementedError()
     def uninstall(self, package):
         raise NotImplementedError()
+    def uninstall_multiple(self, packages):
+        raise NotImplementedError()
     def update_cache(self):
         raise NotImplementedError()
     def clean_cache(self):
         raise NotImplementedError()
     def autoremove(self):
         raise NotImplementedError()
+    def list_orphans(self):
+        raise NotImplementedError()
+    def get_orphans_size(self):
+        """Suma el tamaño instalado real de los paquetes que eliminaría autoremove."""
+        details = self.list_installed_details()
+        total = 0
+        for name in self.list_orphans():
+            info = details.get(name) or details.get(name.split(':')[0]) or {}
+            total += info.get('size', 0)
+        return total
     def fix_broken(self):
         raise NotImplementedError()
     def get_cache_directory(self):
@@ -79,28 +597,67 @@ class PackageManager:
     def install_clamav(self):
         raise NotImplementedError()
 
+APT_LISTS_DIR = "/var/lib/apt/lists"
+DPKG_STATUS_PATH = "/var/lib/dpkg/status"
+
 class AptManager(PackageManager):
-    def search(self, query):
-        results = []
-        try:
-            output = subprocess.check_output(['apt-cache', 'search', query], timeout=10).decode('utf-8')
-            for line in output.split('\n'):
-                if line.strip():
-                    parts = line.split(' - ', 1)
-                    name = parts[0].strip()
-                    desc = parts[1].strip() if len(parts) > 1 else ""
-                    results.append({'name': name, 'desc': desc, 'source': 'apt'})
-        except:
-            pass
-        return results
+    index_name = 'apt'
 
-    def list_installed(self):
-        try:
-            output = subprocess.check_output(['dpkg', '--get-selections'], timeout=15).decode('utf-8')
-            return [line.split()[0] for line in output.split('\n') 
-                    if line.strip() and len(line.split()) > 1 and line.split()[1] == 'install']
-        except:
-            return []
+    def get_index_sources(self):
+        patterns = ("*_Packages", "*_Packages.gz", "*_i18n_Translation-en", "*_i18n_Translation-en.gz")
+        sources = []
+        for pattern in patterns:
+            sources.extend(glob.glob(os.path.join(APT_LISTS_DIR, pattern)))
+        return sources
+
+    def read_index_entries(self):
+        # Debian guarda las descripciones en los archivos Translation, no en Packages
+        translations = {}
+        sources = self.get_index_sources()
+        for path in sources:
+            if '_Translation-' in path:
+                for stanza in iter_control_stanzas(path, ('Package', 'Description-en')):
+                    if 'Package' in stanza:
+                        translations.setdefault(stanza['Package'], stanza.get('Description-en', ''))
+
+        for path in sources:
+            if '_Packages' in path:
+                for stanza in iter_control_stanzas(path, ('Package', 'Description')):
+                    name = stanza.get('Package')
+                    if name:
+                        yield name, stanza.get('Description') or translations.get(name, '')
+
+    def iter_search_live(self, query, spawn=subprocess.Popen):
+        for line in stream_command_lines(['apt-cache', 'search', query], 10, spawn):
+            if line.strip():
+                parts = line.split(' - ', 1)
+                name = parts[0].strip()
+                desc = parts[1].strip() if len(parts) > 1 else ""
+                yield {'name': name, 'desc': desc, 'source': 'apt'}
+
+    def get_installed_sources(self):
+        return [DPKG_STATUS_PATH]
+
+    def read_installed(self):
+        # Leer directamente la base de datos de dpkg en una sola pasada
+        packages = {}
+        fields = ('Package', 'Status', 'Version', 'Architecture', 'Installed-Size', 'Description')
+        for stanza in iter_control_stanzas(DPKG_STATUS_PATH, fields):
+            status = stanza.get('Status', '').split()
+            if len(status) < 3 or status[2] != 'installed' or 'Package' not in stanza:
+                continue
+            name = stanza['Package']
+            arch = stanza.get('Architecture', '')
+            if name in packages:
+                # Paquete de otra arquitectura (multiarch), como hace dpkg --get-selections
+                name = f"{name}:{arch}"
+            try:
+                size = int(stanza.get('Installed-Size', '0')) * 1024  # dpkg lo guarda en KiB
+            except ValueError:
+                size = 0
+            packages[name] = {'version': stanza.get('Version', ''), 'arch': arch,
+                              'size': size, 'desc': stanza.get('Description', '')}
+        return packages
 
     def install(self, package):
         return ['pkexec', 'apt-get', 'install', '-y', package]
@@ -114,6 +671,9 @@ class AptManager(PackageManager):
     def uninstall(self, package):
         return ['pkexec', 'apt-get', 'remove', '-y', package]
 
+    def uninstall_multiple(self, packages):
+        return ['pkexec', 'apt-get', 'remove', '-y'] + packages
+
     def update_cache(self):
         return ['pkexec', 'apt-get', 'update']
 
@@ -123,6 +683,16 @@ class AptManager(PackageManager):
     def autoremove(self):
         return ['pkexec', 'apt-get', 'autoremove', '-y']
 
+    def list_orphans(self):
+        # Simular autoremove (no necesita privilegios) y quedarse con las líneas "Remv paquete [versión]"
+        result = subprocess.run(['apt-get', '-s', 'autoremove'], capture_output=True, text=True,
+                                timeout=60, env={**os.environ, 'LC_ALL': 'C'})
+        orphans = []
+        for line in result.stdout.splitlines():
+            if line.startswith("Remv "):
+                orphans.append(line.split()[1])
+        return orphans
+
     def fix_broken(self):
         return ['pkexec', 'apt-get', 'install', '-f', '-y']
 
@@ -132,54 +702,95 @@ class AptManager(PackageManager):
     def install_clamav(self):
         return ['pkexec', 'apt-get', 'install', '-y', 'clamav', 'clamav-daemon', 'clamav-freshclam']
 
+RPMDB_DIRS = ("/var/lib/rpm", "/usr/lib/sysimage/rpm")
+
 class DnfManager(PackageManager):
-    def search(self, query):
-        results = []
-        try:
-            # Aumentamos el timeout a 30s ya que dnf puede ser muy lento refrescando caché
-            # Usamos --quiet para evitar ruidos de metadatos en la salida
-            output = subprocess.check_output(['dnf', 'search', '--quiet', query], timeout=30).decode('utf-8', errors='ignore')
-            
-            # dnf search puede tener formatos distintos según versión (DNF 4 vs DNF 5)
-            for line in output.split('\n'):
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                # Formato clásico DNF 4: "Name : Summary"
-                if ' : ' in line:
-                    parts = line.split(' : ', 1)
-                    name = parts[0].strip()
-                    
-                    # Limpiar arquitectura si está presente (e.g. name.x86_64)
-                    archs = ('.x86_64', '.i686', '.noarch', '.armv7hl', '.aarch64', '.ppc64le', '.s390x')
-                    for arch in archs:
-                        if name.endswith(arch):
-                            name = name[:-len(arch)]
-                            break
-                            
-                    desc = parts[1].strip()
-                    results.append({'name': name, 'desc': desc, 'source': 'dnf'})
+    index_name = 'dnf'
+
+    def get_index_sources(self):
+        # repomd.xml cambia cada vez que dnf (o dnf5) refresca los metadatos de un repositorio
+        sources = glob.glob("/var/cache/dnf/*/repodata/repomd.xml")
+        sources.extend(glob.glob("/var/cache/libdnf5/*/repodata/repomd.xml"))
+        return sources
+
+    def read_index_entries(self):
+        # Una única consulta a los metadatos ya descargados para construir el índice
+        output = subprocess.check_output(['dnf', 'repoquery', '--quiet', '--cacheonly', '--qf', '%{name}\t%{summary}\n'],
+                                         timeout=120, stderr=subprocess.DEVNULL).decode('utf-8', errors='ignore')
+        for line in output.split('\n'):
+            name, sep, desc = line.partition('\t')
+            if sep and name.strip():
+                yield name.strip(), desc.strip()
+
+    def iter_search_live(self, query, spawn=subprocess.Popen):
+        # Aumentamos el timeout a 30s ya que dnf puede ser muy lento refrescando caché
+        # Usamos --quiet para evitar ruidos de metadatos en la salida
+        # dnf search puede tener formatos distintos según versión (DNF 4 vs DNF 5)
+        for line in stream_command_lines(['dnf', 'search', '--quiet', query], 30, spawn):
+            line = line.strip()
+            if not line:
+                continue
                 
-                # Formato tabular DNF 5: "ID | Summary"
-                elif '|' in line and not line.startswith('---'):
-                    parts = line.split('|', 1)
-                    name = parts[0].strip()
-                    desc = parts[1].strip()
-                    # Ignorar cabeceras
-                    if name.lower() not in ('id', 'nombre', 'name'):
-                        results.append({'name': name, 'desc': desc, 'source': 'dnf'})
-        except Exception as e:
-            print(f"Error en dnf search: {e}")
-            pass
-        return results
-
-    def list_installed(self):
-        try:
-            output = subprocess.check_output(['rpm', '-qa', '--qf', '%{NAME}\\n'], timeout=15).decode('utf-8')
-            return [line.strip() for line in output.split('\n') if line.strip()]
-        except:
-            return []
+            # Formato clásico DNF 4: "Name : Summary"
+            if ' : ' in line:
+                parts = line.split(' : ', 1)
+                name = parts[0].strip()
+                
+                # Limpiar arquitectura si está presente (e.g. name.x86_64)
+                archs = ('.x86_64', '.i686', '.noarch', '.armv7hl', '.aarch64', '.ppc64le', '.s390x')
+                for arch in archs:
+                    if name.endswith(arch):
+                        name = name[:-len(arch)]
+                        break
+                        
+                desc = parts[1].strip()
+                yield {'name': name, 'desc': desc, 'source': 'dnf'}
+            
+            # Formato tabular DNF 5: "ID | Summary"
+            elif '|' in line and not line.startswith('---'):
+                parts = line.split('|', 1)
+                name = parts[0].strip()
+                desc = parts[1].strip()
+                # Ignorar cabeceras
+                if name.lower() not in ('id', 'nombre', 'name'):
+                    yield {'name': name, 'desc': desc, 'source': 'dnf'}
+
+    def get_installed_sources(self):
+        # rpmdb puede estar en /var/lib/rpm o en /usr/lib/sysimage/rpm según la distribución.
+        # Se ignoran los archivos que rpm toca también al leer (memoria compartida y bloqueos)
+        sources = []
+        for rpmdb_dir in RPMDB_DIRS:
+            for path in glob.glob(os.path.join(rpmdb_dir, '*')):
+                name = os.path.basename(path)
+                if not name.endswith('-shm') and not name.startswith('__db') and not name.startswith('.'):
+                    sources.append(path)
+        return sources
+
+    def read_installed(self):
+        # Reutilizar la última instantánea guardada si rpmdb no ha cambiado desde entonces
+        signature = get_files_signature(self.get_installed_sources())
+        cache = CacheFile("rpm_installed.json", 1, "la lista de paquetes RPM")
+        cached = cache.load(signature)
+        if cached is not None:
+            return cached
+
+        # Una sola consulta con todos los datos que necesitamos
+        qf = '%{NAME}\\t%{VERSION}-%{RELEASE}\\t%{ARCH}\\t%{SIZE}\\t%{SUMMARY}\\n'
+        output = subprocess.check_output(['rpm', '-qa', '--qf', qf], timeout=15).decode('utf-8', errors='ignore')
+        packages = {}
+        for line in output.split('\n'):
+            parts = line.split('\t')
+            if len(parts) < 5 or not parts[0].strip():
+                continue
+            name, pkg_version, arch, size, desc = (part.strip() for part in parts[:5])
+            if name in packages:
+                # Mismo paquete para otra arquitectura (i686 y x86_64, por ejemplo)
+                name = f"{name}.{arch}"
+            packages[name] = {'version': pkg_version, 'arch': arch,
+                              'size': int(size) if size.isdigit() else 0, 'desc': desc}
+
+        cache.save(signature, packages)
+        return packages
 
     def install(self, package):
         return ['pkexec', 'dnf', 'install', '-y', package]
@@ -193,6 +804,9 @@ class DnfManager(PackageManager):
     def uninstall(self, package):
         return ['pkexec', 'dnf', 'remove', '-y', package]
 
+    def uninstall_multiple(self, packages):
+        return ['pkexec', 'dnf', 'remove', '-y'] + packages
+
     def update_cache(self):
         return ['pkexec', 'dnf', 'makecache']
 
@@ -202,6 +816,13 @@ class DnfManager(PackageManager):
     def autoremove(self):
         return ['pkexec', 'dnf', 'autoremove', '-y']
 
+    def list_orphans(self):
+        # Paquetes instalados como dependencia que ya nada necesita (lo mismo que quitaría autoremove).
+        # --cacheonly evita que el análisis descargue los metadatos de los repositorios
+        result = subprocess.run(['dnf', 'repoquery', '--quiet', '--cacheonly', '--unneeded', '--qf', '%{name}\n'],
+                                capture_output=True, text=True, timeout=120)
+        return [line.strip() for line in result.stdout.splitlines() if line.strip()]
+
     def fix_broken(self):
         # dnf doesn't have a direct equivalent to apt install -f, but it handles deps better
         return ['pkexec', 'dnf', 'check']
@@ -227,6 +848,120 @@ def get_brew_path():
 BREW_PATH = get_brew_path()
 HAS_BREW = BREW_PATH is not None
 
+# Prefijo de Homebrew: el directorio que contiene bin/brew, Cellar y Caskroom
+BREW_PREFIX = os.path.dirname(os.path.dirname(BREW_PATH)) if HAS_BREW else None
+
+# Descripción de las fórmulas y casks en el código Ruby de los taps
+BREW_DESC_RE = re.compile(r'^\s*desc\s+"((?:[^"\\]|\\.)*)"', re.MULTILINE)
+
+class BrewMetadata:
+    """Metadatos locales de Homebrew para el índice de búsqueda, sin arrancar Ruby.
+
+    Usa la caché de la API de Homebrew (formula.jws.json / cask.jws.json) y,
+    si no existe, los archivos .rb de los taps instalados.
+    """
+    index_name = 'brew'
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def get_api_files(self):
+        cache_dir = os.environ.get('HOMEBREW_CACHE')
+        if not cache_dir:
+            if sys.platform == 'darwin':
+                cache_dir = os.path.expanduser("~/Library/Caches/Homebrew")
+            else:
+                cache_dir = os.path.expanduser("~/.cache/Homebrew")
+        names = ('formula.jws.json', 'cask.jws.json', 'formula.json', 'cask.json')
+        return [os.path.join(cache_dir, 'api', name) for name in names
+                if os.path.exists(os.path.join(cache_dir, 'api', name))]
+
+    def get_tap_dirs(self):
+        taps = []
+        for repository in (self.prefix, os.path.join(self.prefix, 'Homebrew')):
+            taps.extend(glob.glob(os.path.join(repository, 'Library', 'Taps', '*', '*')))
+        return taps
+
+    def get_index_sources(self):
+        api_files = self.get_api_files()
+        if api_files:
+            return api_files
+        # Los directorios cambian de mtime al añadir o quitar fórmulas
+        sources = []
+        for tap in self.get_tap_dirs():
+            for subdir in ('Formula', 'Casks'):
+                path = os.path.join(tap, subdir)
+                if os.path.isdir(path):
+                    sources.append(path)
+                    sources.extend(glob.glob(os.path.join(path, '*', '')))
+        return sources
+
+    def read_index_entries(self):
+        api_files = self.get_api_files()
+        if api_files:
+            for path in api_files:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                # Los archivos .jws.json envuelven la lista en una carga firmada
+                if isinstance(data, dict) and 'payload' in data:
+                    data = json.loads(data['payload'])
+                is_cask = os.path.basename(path).startswith('cask')
+                for item in data:
+                    if is_cask:
+                        yield item.get('token'), item.get('desc') or _("Cask de Homebrew")
+                    else:
+                        yield item.get('name'), item.get('desc') or _("Fórmula de Homebrew")
+            return
+
+        for tap in self.get_tap_dirs():
+            for subdir, default_desc in (('Formula', _("Fórmula de Homebrew")), ('Casks', _("Cask de Homebrew"))):
+                for path in glob.glob(os.path.join(tap, subdir, '**', '*.rb'), recursive=True):
+                    try:
+                        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                            head = f.read(4096)  # La descripción está siempre al principio
+                    except OSError:
+                        continue
+                    match = BREW_DESC_RE.search(head)
+                    yield os.path.basename(path)[:-3], match.group(1) if match else default_desc
+
+    def list_installed(self):
+        """Fórmulas (Cellar) y casks (Caskroom) instalados, leyendo los directorios."""
+        formulas, casks = [], []
+        for dirname, target in (('Cellar', formulas), ('Caskroom', casks)):
+            try:
+                target.extend(sorted(name for name in os.listdir(os.path.join(self.prefix, dirname))
+                                     if not name.startswith('.')))
+            except OSError:
+                pass
+        return formulas, casks
+
+brew_metadata = BrewMetadata(BREW_PREFIX) if HAS_BREW else None
+brew_index = PackageIndex(brew_metadata) if HAS_BREW else None
+
+def brew_search(query, spawn=subprocess.Popen, limit=None):
+    """Busca fórmulas y casks de Homebrew que coincidan con la consulta.
+
+    Devuelve (resultados, completos), igual que PackageManager.search.
+    """
+    # Con el índice local no hace falta arrancar Ruby
+    if brew_index:
+        results = brew_index.search(query)
+        if results is not None:
+            return results, True
+
+    print(f"DEBUG: Buscando '{query}' en Homebrew usando {BREW_PATH}")
+    results = []
+    stream = stream_command_lines([BREW_PATH, 'search', query], SEARCH_DEADLINES['brew'], spawn)
+    try:
+        for line in stream:
+            if line.strip() and not line.startswith('=='):
+                results.append({'name': line.strip(), 'desc': _("Fórmula de Homebrew"), 'source': 'brew'})
+                if limit is not None and len(results) >= limit:
+                    break
+    finally:
+        stream.close()
+    return results, limit is None or len(results) < limit
+
 def get_package_manager():
     if shutil.which('dnf'):
         return DnfManager()
@@ -238,6 +973,86 @@ def get_package_manager():
 
 pkg_manager = get_package_manager()
 
+class SearchCancelled(Exception):
+    """La búsqueda ha quedado obsoleta y su proceso se ha terminado."""
+
+class SearchScheduler:
+    """Planificador de búsquedas con números de generación.
+
+    Cada búsqueda nueva deja obsoletas las anteriores: sus procesos hijos
+    (apt-cache, dnf, brew...) se terminan y sus resultados se descartan.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.processes = []
+
+    def begin(self):
+        """Empieza una búsqueda nueva y cancela las que sigan en curso."""
+        with self.lock:
+            self.generation += 1
+            stale = self.processes
+            self.processes = []
+        for process in stale:
+            self.terminate(process)
+        return self.generation
+
+    def cancel(self):
+        """Cancela cualquier búsqueda en curso sin empezar otra."""
+        self.begin()
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def spawner(self, generation):
+        """Devuelve una función para lanzar procesos ligados a una generación."""
+        def spawn(cmd, **kwargs):
+            process = subprocess.Popen(cmd, **kwargs)
+            with self.lock:
+                current = generation == self.generation
+                if current:
+                    # Olvidar los procesos que ya han terminado
+                    self.processes = [p for p in self.processes if p.poll() is None]
+                    self.processes.append(process)
+            if not current:
+                self.terminate(process)
+            return process
+        return spawn
+
+    def terminate(self, process):
+        try:
+            if process.poll() is None:
+                process.terminate()
+        except OSError:
+            pass
+
+class SearchSession:
+    """Sesión de búsqueda incremental para la entrada de nombre de paquete.
+
+    Guarda los candidatos de la última consulta completada y, cuando la nueva
+    consulta solo amplía la anterior ("fire" -> "firef"), los filtra en memoria
+    en lugar de volver a preguntar a los gestores de paquetes.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.query = None
+        self.candidates = []
+
+    def narrow(self, query):
+        """Filtra los candidatos anteriores. Devuelve None si hay que buscar de nuevo."""
+        with self.lock:
+            previous, candidates = self.query, self.candidates
+        q = query.lower()
+        if previous is None or not q.startswith(previous.lower()):
+            return None
+        return [r for r in candidates if q in r['name'].lower() or q in r['desc'].lower()]
+
+    def store(self, query, candidates):
+        """Guarda los candidatos completos de una búsqueda."""
+        with self.lock:
+            self.query = query
+            self.candidates = candidates
+
 # Aplicar CSS para un estilo GNOME moderno
 def load_css():
     css_provider = Gtk.CssProvider()
@@ -371,6 +1186,66 @@ def get_safe_window_size(default_width, default_height, scale_factor=0.8):
     # Fallback a tamaño por defecto
     return default_width, default_height
 
+class UIUpdateBus:
+    """Canal compartido para que los hilos de trabajo actualicen la interfaz.
+
+    Los avisos se guardan en una cola y se entregan en el hilo principal como
+    mucho una vez por fotograma. Los avisos seguidos a la misma función se
+    agrupan: los pasos de progreso se suman y los textos se unen.
+    """
+    FRAME_INTERVAL_MS = 33  # Unas 30 actualizaciones por segundo
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = []
+        self.scheduled = False
+
+    def step(self, func, steps=1):
+        """Avance de progreso: func(pasos) recibe todos los pasos acumulados."""
+        self._post(func, 'step', steps)
+
+    def text(self, func, text):
+        """Texto para añadir: func(texto) recibe todo el texto acumulado."""
+        self._post(func, 'text', text)
+
+    def call(self, func, *args):
+        """Llamada normal, entregada en orden con el resto de avisos."""
+        self._post(func, 'call', args)
+
+    def _post(self, func, kind, value):
+        with self.lock:
+            last = self.entries[-1] if self.entries else None
+            if last and kind != 'call' and last[0] == func and last[1] == kind:
+                if kind == 'step':
+                    last[2] += value
+                else:
+                    last[2].append(value)
+            else:
+                self.entries.append([func, kind, [value] if kind == 'text' else value])
+            if self.scheduled:
+                return
+            self.scheduled = True
+        GLib.timeout_add(self.FRAME_INTERVAL_MS, self._flush)
+
+    def _flush(self):
+        with self.lock:
+            entries = self.entries
+            self.entries = []
+            self.scheduled = False
+        for func, kind, value in entries:
+            try:
+                if kind == 'step':
+                    func(value)
+                elif kind == 'text':
+                    func("".join(value))
+                else:
+                    func(*value)
+            except Exception as e:
+                print(f"Error actualizando la interfaz: {e}")
+        return False
+
+ui_bus = UIUpdateBus()
+
 def check_for_updates():
     """Comprueba las actualizaciones conectando con la API de GitHub con mejor manejo de errores."""
     try:
@@ -422,6 +1297,350 @@ class UpdateDialog(Adw.AlertDialog):
         
         self.release_url = release_url
 
+class ProgressTracker:
+    """Cuenta los archivos y bytes procesados por los hilos de trabajo.
+
+    Avisa a la UI como mucho una vez cada interval segundos, con un único aviso
+    pendiente: callback(fracción, archivos, bytes, bytes/s, segundos restantes o None).
+    Los cambios que llegan antes de tiempo no se pierden: se avisa de ellos al
+    terminar el intervalo. La fracción es bytes hechos / total_bytes; sin total
+    (0) se queda en 0 y no hay tiempo restante.
+    """
+    def __init__(self, callback, total_bytes=0, interval=0.1):
+        self.callback = callback
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.files = 0
+        self.bytes = 0
+        self.start_time = time.monotonic()
+        self.last_emit = 0
+        self.pending = False
+        self.stopped = False
+
+    def add(self, files=0, bytes=0):
+        with self.lock:
+            self.files += files
+            self.bytes += bytes
+        self._emit()
+
+    def stop(self):
+        """Deja de avisar (p. ej. antes de mostrar el resultado final)."""
+        with self.lock:
+            self.stopped = True
+
+    def _emit(self):
+        with self.lock:
+            # Si ya hay un aviso pendiente, leerá los contadores al ejecutarse
+            if self.stopped or self.pending:
+                return
+            self.pending = True
+            delay = self.interval - (time.monotonic() - self.last_emit)
+        if delay > 0:
+            # Demasiado pronto: avisar cuando termine el intervalo
+            GLib.timeout_add(int(delay * 1000) + 1, self._flush)
+        else:
+            ui_bus.call(self._flush)
+
+    def _flush(self):
+        with self.lock:
+            self.pending = False
+            if self.stopped:
+                return False
+            self.last_emit = time.monotonic()
+            files = self.files
+            done_bytes = self.bytes
+        elapsed = max(time.monotonic() - self.start_time, 1e-6)
+        fraction = min(done_bytes / self.total_bytes, 1.0) if self.total_bytes else 0.0
+        eta = elapsed * (1 - fraction) / fraction if 0 < fraction < 1 else None
+        self.callback(fraction, files, done_bytes, done_bytes / elapsed, eta)
+        return False
+
+def push_largest(heap, limit, size, path):
+    """Mantiene en heap los limit elementos más grandes (montículo de mínimos acotado)."""
+    if len(heap) < limit:
+        heapq.heappush(heap, (size, path))
+    elif size > heap[0][0]:
+        heapq.heapreplace(heap, (size, path))
+
+def scan_subtree_usage(path, top_n=0, progress=None, candidates=None):
+    """Suma el espacio ocupado (bloques asignados) de un subárbol.
+
+    Usa os.scandir y no sigue enlaces simbólicos. Los archivos con varios
+    enlaces duros solo se cuentan una vez. Devuelve (bytes, archivos, los
+    top_n archivos más grandes como lista de (bytes, ruta), {(st_dev, st_ino):
+    bytes} de los archivos con varios enlaces) para que quien junte varios
+    subárboles pueda descontar los enlaces repetidos entre ellos. Si se pasa
+    la lista candidates, se le añade (último uso, bytes, ruta) de cada archivo
+    para plan_cache_eviction.
+    """
+    total = 0
+    files = 0
+    largest = []
+    linked = {}
+    pending = [path]
+    reported_files = reported_bytes = 0
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue  # Archivo inaccesible
+                    if stat.S_ISDIR(st.st_mode):
+                        pending.append(entry.path)
+                    else:
+                        if st.st_nlink > 1:
+                            key = (st.st_dev, st.st_ino)
+                            if key in linked:
+                                continue
+                            linked[key] = st.st_blocks * 512
+                        files += 1
+                        if top_n:
+                            push_largest(largest, top_n, st.st_blocks * 512, entry.path)
+                        if candidates is not None:
+                            candidates.append((max(st.st_atime, st.st_mtime), st.st_blocks * 512, entry.path))
+                    total += st.st_blocks * 512
+                    # Informar del avance en bloques para no bloquear el contador en cada archivo,
+                    # también dentro de carpetas con miles de archivos
+                    if progress and files - reported_files >= 256:
+                        progress.add(files - reported_files, total - reported_bytes)
+                        reported_files, reported_bytes = files, total
+        except OSError:
+            pass
+    if progress:
+        progress.add(files - reported_files, total - reported_bytes)
+    return total, files, largest, linked
+
+def delete_tree(path, progress=None):
+    """Borra un archivo o un árbol en una sola pasada.
+
+    Devuelve los bytes realmente liberados: los bloques de lo que se ha podido
+    borrar. Un archivo con varios enlaces duros solo cuenta cuando se borra su
+    último enlace, así no se cuentan los que siguen enlazados desde otro sitio.
+    """
+    # (st_dev, st_ino) -> [enlaces que tenía al verlo por primera vez, enlaces borrados]
+    links = {}
+
+    def unlinked_size(st):
+        key = (st.st_dev, st.st_ino)
+        if st.st_nlink <= 1 and key not in links:
+            return st.st_blocks * 512
+        # st_nlink baja con cada enlace borrado: se compara con el primer valor visto
+        counts = links.setdefault(key, [st.st_nlink, 0])
+        counts[1] += 1
+        return st.st_blocks * 512 if counts[1] == counts[0] else 0
+
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return 0
+    if not stat.S_ISDIR(st.st_mode):
+        try:
+            os.unlink(path)
+        except OSError:
+            return 0
+        freed = unlinked_size(st)
+        if progress:
+            progress.add(1, freed)
+        return freed
+
+    freed = 0
+    # Recorrido en postorden: primero el contenido y después la carpeta vacía
+    pending = [(path, st, False)]
+    while pending:
+        current, current_st, emptied = pending.pop()
+        if emptied:
+            try:
+                os.rmdir(current)
+                freed += current_st.st_blocks * 512
+            except OSError:
+                pass
+            continue
+        pending.append((current, current_st, True))
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        entry_st = entry.stat(follow_symlinks=False)
+                        if stat.S_ISDIR(entry_st.st_mode):
+                            pending.append((entry.path, entry_st, False))
+                            continue
+                        os.unlink(entry.path)
+                    except OSError:
+                        continue
+                    size = unlinked_size(entry_st)
+                    freed += size
+                    if progress:
+                        progress.add(1, size)
+        except OSError:
+            pass
+    return freed
+
+class DirectoryScanner:
+    """Mide el espacio en disco de varias rutas repartiendo sus subárboles en hilos."""
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or min(8, (os.cpu_count() or 1) * 2)
+
+    def measure(self, paths, top_n=0, on_report=None, progress=None, candidates=None):
+        """Devuelve {ruta: bytes ocupados}.
+
+        Con top_n y on_report se avisa
+        de cada ruta a medida que avanza el análisis con
+        on_report(ruta, bytes, subcarpetas más grandes, archivos más grandes, terminado).
+        progress es un ProgressTracker al que se suman los archivos y bytes recorridos.
+        candidates es {ruta: lista}: para esas rutas se recogen en la lista los
+        archivos como (último uso, bytes, ruta), listos para plan_cache_eviction.
+        """
+        results = {path: 0 for path in paths}
+        entry_sizes = {}
+        subtrees = []
+        # Montículos acotados por ruta con las subcarpetas y archivos más grandes
+        top_dirs = {path: [] for path in paths}
+        top_files = {path: [] for path in paths}
+        remaining = {path: 0 for path in paths}
+        # Archivos con varios enlaces duros ya contados, como du
+        linked = set()
+        for path in paths:
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            results[path] += st.st_blocks * 512
+            if not stat.S_ISDIR(st.st_mode):
+                continue
+            # Los archivos del primer nivel se suman aquí y cada subcarpeta va a un hilo
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            entry_st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if entry_st.st_nlink > 1 and not stat.S_ISDIR(entry_st.st_mode):
+                            key = (entry_st.st_dev, entry_st.st_ino)
+                            if key in linked:
+                                continue
+                            linked.add(key)
+                        results[path] += entry_st.st_blocks * 512
+                        entry_sizes[entry.path] = entry_st.st_blocks * 512
+                        if stat.S_ISDIR(entry_st.st_mode):
+                            subtrees.append((path, entry.path))
+                            remaining[path] += 1
+                        else:
+                            if top_n:
+                                push_largest(top_files[path], top_n, entry_st.st_blocks * 512, entry.path)
+                            if candidates and path in candidates:
+                                candidates[path].append((max(entry_st.st_atime, entry_st.st_mtime),
+                                                         entry_st.st_blocks * 512, entry.path))
+                            if progress:
+                                progress.add(1, entry_st.st_blocks * 512)
+            except OSError:
+                pass
+
+        def report(root):
+            if on_report:
+                on_report(root, results[root], sorted(top_dirs[root], reverse=True),
+                          sorted(top_files[root], reverse=True), remaining[root] == 0)
+
+        # Las rutas sin subcarpetas ya están medidas
+        for path in paths:
+            if remaining[path] == 0:
+                report(path)
+
+        if subtrees:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                # Cada hilo rellena su propia lista de candidatos y aquí se juntan
+                futures = {}
+                for root, subtree in subtrees:
+                    subtree_candidates = [] if candidates and root in candidates else None
+                    future = pool.submit(scan_subtree_usage, subtree, top_n, progress, subtree_candidates)
+                    futures[future] = (root, subtree, subtree_candidates)
+                for future in as_completed(futures):
+                    root, subtree, subtree_candidates = futures[future]
+                    size, _files, largest, subtree_linked = future.result()
+                    if subtree_candidates:
+                        candidates[root].extend(subtree_candidates)
+                    # Descontar los enlaces duros que ya se contaron en otro subárbol
+                    for key, linked_size in subtree_linked.items():
+                        if key in linked:
+                            size -= linked_size
+                        else:
+                            linked.add(key)
+                    results[root] += size
+                    entry_sizes[subtree] += size
+                    remaining[root] -= 1
+                    if top_n:
+                        push_largest(top_dirs[root], top_n, entry_sizes[subtree], subtree)
+                        for file_size, file_path in largest:
+                            push_largest(top_files[root], top_n, file_size, file_path)
+                    report(root)
+        return results
+
+# Cuántas carpetas y archivos más grandes se muestran por directorio analizado
+CLEANUP_REPORT_TOP_N = 5
+
+# Directorios de los que solo se limpia el contenido y a los que se aplica la política de cachés
+CLEANUP_CACHE_DIRECTORIES = ("~/.cache", "/tmp", "/var/tmp", "~/.thumbnails")
+
+def plan_cache_eviction(files, max_age_days=None, budget_bytes=None, now=None):
+    """Elige qué archivos borrar de una caché sin vaciarla entera.
+
+    files son los archivos de la caché como (último uso, bytes, ruta), tal y
+    como los recoge DirectoryScanner.measure; el último uso es el más reciente
+    entre atime y mtime. Con max_age_days se eligen los archivos que no se usan
+    desde hace más de esos días. Con budget_bytes se eligen los menos usados
+    recientemente hasta que la caché quepa en ese tamaño. Devuelve una lista
+    de (ruta, bytes, último uso).
+    """
+    if max_age_days is not None:
+        limit = (now or time.time()) - max_age_days * 86400
+        return [(path, size, last_use) for last_use, size, path in files if last_use < limit]
+
+    # Desalojar primero lo que lleva más tiempo sin usarse (LRU)
+    files = sorted(files)
+    total = sum(size for _last_use, size, _path in files)
+    victims = []
+    for last_use, size, path in files:
+        if total <= budget_bytes:
+            break
+        victims.append((path, size, last_use))
+        total -= size
+    return victims
+
+def apply_cache_eviction(root, plan, progress=None):
+    """Borra los archivos del plan que no se hayan usado desde el análisis.
+
+    Devuelve los bytes liberados y quita las carpetas que se queden vacías.
+    """
+    freed = 0
+    parents = set()
+    for path, size, last_use in plan:
+        try:
+            st = os.lstat(path)
+            if max(st.st_atime, st.st_mtime) != last_use:
+                continue  # Se ha usado desde el análisis: se conserva
+            os.unlink(path)
+        except OSError:
+            continue
+        size = st.st_blocks * 512 if st.st_nlink <= 1 else 0
+        freed += size
+        if progress:
+            progress.add(1, size)
+        parents.add(os.path.dirname(path))
+
+    # Quitar las carpetas vacías de abajo arriba, sin tocar la raíz
+    for directory in sorted(parents, key=len, reverse=True):
+        while directory != root and directory.startswith(root + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+    return freed
+
 class SystemCleanupWindow(Adw.Window):
     def __init__(self, parent):
         super().__init__()
@@ -571,6 +1790,46 @@ class SystemCleanupWindow(Adw.Window):
         pkg_cache_box.append(pkg_cache_info)
         advanced_section.append(pkg_cache_box)
 
+        # Política para cachés y temporales: borrarlo todo o solo lo que no se usa
+        policy_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=8)
+        
+        policy_label = Gtk.Label(label=_("Qué borrar de cachés y temporales"), xalign=0)
+        policy_label.add_css_class("title-label")
+        policy_box.append(policy_label)
+        
+        policy_desc = Gtk.Label(label=_("Conservar lo que se usa evita que las aplicaciones tengan que regenerarlo"), xalign=0)
+        policy_desc.add_css_class("subtitle-label")
+        policy_desc.set_wrap(True)
+        policy_box.append(policy_desc)
+        
+        self.policy_dropdown = Gtk.DropDown.new_from_strings([
+            _("Todo"),
+            _("Lo que no se ha usado en los últimos días"),
+            _("Lo menos usado hasta quedar en un tamaño máximo"),
+        ])
+        self.policy_dropdown.connect("notify::selected", self.on_policy_changed)
+        policy_box.append(self.policy_dropdown)
+        
+        self.age_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        self.age_spin = Gtk.SpinButton.new_with_range(1, 365, 1)
+        self.age_spin.set_value(30)
+        self.age_spin.connect("value-changed", self.on_policy_changed)
+        self.age_box.append(self.age_spin)
+        self.age_box.append(Gtk.Label(label=_("días sin usarse")))
+        self.age_box.set_visible(False)
+        policy_box.append(self.age_box)
+        
+        self.budget_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        self.budget_spin = Gtk.SpinButton.new_with_range(10, 100000, 50)
+        self.budget_spin.set_value(500)
+        self.budget_spin.connect("value-changed", self.on_policy_changed)
+        self.budget_box.append(self.budget_spin)
+        self.budget_box.append(Gtk.Label(label=_("MB como máximo por directorio")))
+        self.budget_box.set_visible(False)
+        policy_box.append(self.budget_box)
+        
+        advanced_section.append(policy_box)
+
         main_box.append(advanced_section)
 
         # Botones de acción
@@ -615,113 +1874,258 @@ class SystemCleanupWindow(Adw.Window):
         self.status_label.add_css_class("status-label")
         main_box.append(self.status_label)
 
+        # Desglose del análisis: lo que más ocupa de cada directorio
+        self.report_section = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=8)
+        self.report_section.add_css_class("card")
+        self.report_section.set_visible(False)
+        
+        report_title = Gtk.Label(label=_("Lo que más ocupa"))
+        report_title.add_css_class("title-label")
+        self.report_section.append(report_title)
+        
+        self.report_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        self.report_section.append(self.report_box)
+        main_box.append(self.report_section)
+        self.report_rows = {}
+
         # Variables para almacenar resultados del análisis
         self.analysis_results = {}
         self.total_size = 0
+        self.scanner = DirectoryScanner()
+        # Bytes medidos por ruta en el último análisis: estiman el total del siguiente
+        self.analysis_sizes = {}
+        # Política de cachés usada en el último análisis y archivos que eligió por ruta
+        self.cleanup_policy = ("all", None, None)
+        self.eviction_plans = {}
+
+    def get_cleanup_policy(self):
+        """Devuelve (modo, días, bytes máximos) según los controles de la política."""
+        selected = self.policy_dropdown.get_selected()
+        if selected == 1:
+            return ("age", self.age_spin.get_value_as_int(), None)
+        elif selected == 2:
+            return ("budget", None, self.budget_spin.get_value_as_int() * 1024 * 1024)
+        return ("all", None, None)
+
+    def on_policy_changed(self, *args):
+        selected = self.policy_dropdown.get_selected()
+        self.age_box.set_visible(selected == 1)
+        self.budget_box.set_visible(selected == 2)
+        # El análisis anterior ya no vale para la nueva política
+        if self.clean_button.get_sensitive():
+            self.clean_button.set_sensitive(False)
+            self.status_label.set_text(_("Has cambiado la política: vuelve a presionar 'Analizar'"))
 
     def on_analyze_clicked(self, button):
         """Analiza el espacio que se puede liberar."""
+        self.cleanup_policy = self.get_cleanup_policy()
         self.analyze_button.set_sensitive(False)
         self.clean_button.set_sensitive(False)
         self.progress_bar.set_visible(True)
         self.progress_bar.set_fraction(0.0)
         self.status_label.set_text(_("Analizando archivos..."))
         
+        # Vaciar el desglose del análisis anterior
+        child = self.report_box.get_first_child()
+        while child:
+            self.report_box.remove(child)
+            child = self.report_box.get_first_child()
+        self.report_rows = {}
+        self.report_section.set_visible(False)
+        
         thread = threading.Thread(target=self.analyze_cleanup)
         thread.daemon = True
         thread.start()
 
     def analyze_cleanup(self):
         """Realiza el análisis en un hilo separado."""
+        progress = ProgressTracker(self.update_analysis_progress)
         try:
             self.analysis_results = {}
             self.total_size = 0
             
-            # Analizar cada directorio seleccionado
+            # Los paquetes huérfanos se calculan en paralelo con el recorrido de los directorios
+            orphan_result = {}
+            orphan_thread = None
+            if self.orphan_check.get_active():
+                orphan_thread = threading.Thread(target=lambda: orphan_result.update(size=self.get_orphan_packages_size()))
+                orphan_thread.daemon = True
+                orphan_thread.start()
+            
+            # Analizar todos los directorios seleccionados (y la caché de paquetes) a la vez
             selected_dirs = [d for d, check in self.directory_checks.items() if check.get_active()]
-            total_dirs = len(selected_dirs)
+            expanded = {directory: self.expand_directory(directory) for directory in selected_dirs}
+            all_paths = [path for paths in expanded.values() for path in paths]
+            pkg_cache_dir = None
+            if self.apt_check.get_active():
+                pkg_cache_dir = pkg_manager.get_cache_directory()
+                if pkg_cache_dir not in all_paths:
+                    all_paths.append(pkg_cache_dir)
+            # La barra avanza por bytes recorridos sobre una estimación del total
+            progress.total_bytes = self.estimate_analysis_bytes(all_paths)
+            # Con una política de cachés, el mismo recorrido recoge los archivos candidatos a borrar
+            mode, max_age_days, budget_bytes = self.cleanup_policy
+            candidates = {}
+            if mode != "all":
+                for directory in selected_dirs:
+                    if directory in CLEANUP_CACHE_DIRECTORIES:
+                        for path in expanded[directory]:
+                            candidates[path] = []
+            # Enviar el desglose a la ventana mientras avanza, como mucho 4 veces por segundo por ruta
+            # y con un único aviso pendiente por ruta en ui_bus (que lee el desglose más reciente)
+            last_report = {}
+            pending_reports = {}
+            reports_lock = threading.Lock()
+            def flush_report(path):
+                with reports_lock:
+                    size, top_dirs, top_files = pending_reports.pop(path)
+                self.update_report(path, size, top_dirs, top_files)
+            def on_report(path, size, top_dirs, top_files, finished):
+                now = time.time()
+                if finished or now - last_report.get(path, 0) >= 0.25:
+                    last_report[path] = now
+                    with reports_lock:
+                        scheduled = path in pending_reports
+                        pending_reports[path] = (size, top_dirs, top_files)
+                    if not scheduled:
+                        ui_bus.call(flush_report, path)
             
-            for i, directory in enumerate(selected_dirs):
-                GLib.idle_add(self.update_progress, i / total_dirs)
-                size = self.get_directory_size(directory)
+            sizes = self.scanner.measure(
+                all_paths,
+                CLEANUP_REPORT_TOP_N,
+                on_report,
+                progress,
+                candidates
+            )
+            self.analysis_sizes = sizes
+            
+            # Con una política de cachés solo cuenta lo que se va a borrar de verdad
+            self.eviction_plans = {}
+            for directory in selected_dirs:
+                if mode != "all" and directory in CLEANUP_CACHE_DIRECTORIES:
+                    size = 0
+                    for path in expanded[directory]:
+                        plan = plan_cache_eviction(candidates[path], max_age_days, budget_bytes)
+                        self.eviction_plans[path] = plan
+                        size += sum(entry_size for _path, entry_size, _last_use in plan)
+                else:
+                    size = sum(sizes.get(path, 0) for path in expanded[directory])
                 self.analysis_results[directory] = size
                 self.total_size += size
             
             # Analizar paquetes huérfanos si está seleccionado
-            if self.orphan_check.get_active():
-                GLib.idle_add(self.update_progress, 0.8)
-                orphan_size = self.get_orphan_packages_size()
+            if orphan_thread:
+                orphan_thread.join()
+                orphan_size = orphan_result.get('size', 0)
                 self.analysis_results["paquetes_huerfanos"] = orphan_size
                 self.total_size += orphan_size
             
             # Analizar caché de paquetes si está seleccionado
-            if self.apt_check.get_active():
-                GLib.idle_add(self.update_progress, 0.9)
-                pkg_cache_size = self.get_package_cache_size()
+            if pkg_cache_dir:
+                pkg_cache_size = sizes.get(pkg_cache_dir, 0)
                 self.analysis_results["package_cache"] = pkg_cache_size
                 self.total_size += pkg_cache_size
             
+            progress.stop()
             GLib.idle_add(self.analysis_complete)
             
         except Exception as e:
             print(f"Error en análisis: {e}")
+            progress.stop()
             GLib.idle_add(self.analysis_error, str(e))
 
-    def get_directory_size(self, directory):
-        """Calcula el tamaño de un directorio."""
-        import os
-        total_size = 0
-        try:
-            # Expandir ~ y variables
-            expanded_dir = os.path.expanduser(directory)
-            
-            if "*" in expanded_dir:
-                # Manejar wildcards
-                import glob
-                matching_dirs = glob.glob(expanded_dir)
-                for match_dir in matching_dirs:
-                    if os.path.exists(match_dir):
-                        total_size += self._calculate_dir_size(match_dir)
-            else:
-                if os.path.exists(expanded_dir):
-                    total_size = self._calculate_dir_size(expanded_dir)
-        except Exception as e:
-            print(f"Error calculando tamaño de {directory}: {e}")
-        
-        return total_size
+    def estimate_analysis_bytes(self, paths):
+        """Estima cuántos bytes va a recorrer el análisis (0 si no hay estimación).
 
-    def _calculate_dir_size(self, directory):
-        """Calcula el tamaño de un directorio específico."""
-        total_size = 0
-        try:
-            for dirpath, dirnames, filenames in os.walk(directory):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    try:
-                        total_size += os.path.getsize(filepath)
-                    except (OSError, IOError):
-                        pass  # Archivo inaccesible
-        except Exception:
-            pass
-        
-        return total_size
+        Si el análisis anterior midió todas las rutas se usa su total; si no, lo
+        ocupado en los sistemas de archivos de las rutas según statvfs.
+        """
+        if paths and all(path in self.analysis_sizes for path in paths):
+            return sum(self.analysis_sizes[path] for path in paths)
+        used = {}
+        for path in paths:
+            try:
+                device = os.stat(path).st_dev
+                vfs = os.statvfs(path)
+            except OSError:
+                continue
+            used[device] = (vfs.f_blocks - vfs.f_bfree) * vfs.f_frsize
+        return sum(used.values())
+
+    def expand_directory(self, directory):
+        """Expande ~ y comodines y devuelve las rutas que existen."""
+        expanded_dir = os.path.expanduser(directory)
+        if "*" in expanded_dir:
+            # Manejar wildcards
+            return [path for path in glob.glob(expanded_dir) if os.path.exists(path)]
+        return [expanded_dir] if os.path.exists(expanded_dir) else []
 
     def get_orphan_packages_size(self):
-        """Estima el tamaño de los paquetes huérfanos."""
+        """Calcula el tamaño real de los paquetes huérfanos."""
         try:
-            # Usar pkg_manager para obtener la lista de paquetes
-            packages = pkg_manager.list_installed()
-            return len(packages) * 1024 * 1024  # 1MB promedio estimado
-        except:
+            return pkg_manager.get_orphans_size()
+        except Exception as e:
+            print(f"Error calculando el tamaño de los paquetes huérfanos: {e}")
             return 0
 
-    def get_package_cache_size(self):
-        """Calcula el tamaño del caché de paquetes."""
-        return self._calculate_dir_size(pkg_manager.get_cache_directory())
+    def update_report(self, path, size, top_dirs, top_files):
+        """Muestra (o actualiza) el desglose de una ruta analizada."""
+        expander = self.report_rows.get(path)
+        if expander is None:
+            # Las etiquetas se crean una sola vez; las actualizaciones solo cambian su texto
+            expander = Gtk.Expander()
+            details = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
+            details.set_margin_start(16)
+            expander.sections = []
+            for heading in (_("Carpetas más grandes"), _("Archivos más grandes")):
+                heading_label = Gtk.Label(label=heading, xalign=0)
+                heading_label.add_css_class("subtitle-label")
+                details.append(heading_label)
+                entry_labels = []
+                for _position in range(CLEANUP_REPORT_TOP_N):
+                    entry_label = Gtk.Label(xalign=0)
+                    entry_label.set_ellipsize(3) # Pango.EllipsizeMode.END
+                    details.append(entry_label)
+                    entry_labels.append(entry_label)
+                expander.sections.append((heading_label, entry_labels))
+            expander.set_child(details)
+            self.report_rows[path] = expander
+            self.report_box.append(expander)
+            self.report_section.set_visible(True)
+        expander.set_label(f"{path} — {self.format_size(size)}")
+        
+        for (heading_label, entry_labels), entries in zip(expander.sections, (top_dirs, top_files)):
+            heading_label.set_visible(bool(entries))
+            for position, entry_label in enumerate(entry_labels):
+                if position < len(entries):
+                    entry_size, entry_path = entries[position]
+                    entry_label.set_label(f"{self.format_size(entry_size)}  {os.path.relpath(entry_path, path)}")
+                    entry_label.set_visible(True)
+                else:
+                    entry_label.set_visible(False)
+        return False
 
-    def update_progress(self, fraction):
-        """Actualiza la barra de progreso."""
+    def format_eta(self, seconds):
+        """Formatea el tiempo restante estimado."""
+        if seconds is None:
+            return _("calculando...")
+        seconds = int(seconds)
+        if seconds >= 60:
+            return _("{} min {} s").format(seconds // 60, seconds % 60)
+        return _("{} s").format(seconds)
+
+    def update_analysis_progress(self, fraction, files, done_bytes, rate, eta):
+        """Muestra el avance del análisis: archivos y bytes recorridos, velocidad y tiempo restante."""
         self.progress_bar.set_fraction(fraction)
+        self.status_label.set_text(_("Analizando: {} archivos, {} ({}/s). Tiempo restante: {}").format(
+            files, self.format_size(done_bytes), self.format_size(rate), self.format_eta(eta)))
+        return False
+
+    def update_cleanup_progress(self, fraction, files, done_bytes, rate, eta):
+        """Muestra el avance de la limpieza: bytes liberados, velocidad y tiempo restante."""
+        self.progress_bar.set_fraction(fraction)
+        self.status_label.set_text(_("Limpiando: {} archivos, {} liberados ({}/s). Tiempo restante: {}").format(
+            files, self.format_size(done_bytes), self.format_size(rate), self.format_eta(eta)))
         return False
 
     def analysis_complete(self):
@@ -789,84 +2193,50 @@ class SystemCleanupWindow(Adw.Window):
 
     def perform_cleanup(self):
         """Realiza la limpieza en un hilo separado."""
+        # El total estimado por el análisis es la referencia del avance
+        progress = ProgressTracker(self.update_cleanup_progress, self.total_size)
         try:
             cleaned_size = 0
             
             # Limpiar directorios seleccionados
             selected_dirs = [d for d, check in self.directory_checks.items() if check.get_active()]
-            total_operations = len(selected_dirs) + (1 if self.orphan_check.get_active() else 0) + (1 if self.apt_check.get_active() else 0)
-            current_op = 0
             
             for directory in selected_dirs:
-                GLib.idle_add(self.update_progress, current_op / total_operations)
-                cleaned_size += self.clean_directory(directory)
-                current_op += 1
+                cleaned_size += self.clean_directory(directory, progress)
             
             # Limpiar paquetes huérfanos
             if self.orphan_check.get_active():
-                GLib.idle_add(self.update_progress, current_op / total_operations)
                 self.clean_orphan_packages()
-                current_op += 1
+                progress.add(bytes=self.analysis_results.get("paquetes_huerfanos", 0))
             
             # Limpiar caché de paquetes
             if self.apt_check.get_active():
-                GLib.idle_add(self.update_progress, current_op / total_operations)
                 self.clean_package_cache()
-                current_op += 1
+                progress.add(bytes=self.analysis_results.get("package_cache", 0))
             
+            progress.stop()
             GLib.idle_add(self.cleanup_complete, cleaned_size)
             
         except Exception as e:
             print(f"Error en limpieza: {e}")
+            progress.stop()
             GLib.idle_add(self.cleanup_error, str(e))
 
-    def clean_directory(self, directory):
+    def clean_directory(self, directory, progress=None):
         """Limpia un directorio específico."""
-        import shutil
         cleaned_size = 0
         
         try:
-            expanded_dir = os.path.expanduser(directory)
-            
-            if "*" in expanded_dir:
-                import glob
-                matching_dirs = glob.glob(expanded_dir)
-                for match_dir in matching_dirs:
-                    if os.path.exists(match_dir):
-                        if os.path.isfile(match_dir):
-                            size = os.path.getsize(match_dir)
-                            os.remove(match_dir)
-                            cleaned_size += size
-                        elif os.path.isdir(match_dir):
-                            size = self._calculate_dir_size(match_dir)
-                            shutil.rmtree(match_dir, ignore_errors=True)
-                            cleaned_size += size
-            else:
-                if os.path.exists(expanded_dir):
-                    if os.path.isfile(expanded_dir):
-                        size = os.path.getsize(expanded_dir)
-                        os.remove(expanded_dir)
-                        cleaned_size += size
-                    elif os.path.isdir(expanded_dir):
-                        # Para directorios importantes, solo limpiar el contenido
-                        if directory in ["~/.cache", "/tmp", "/var/tmp", "~/.thumbnails"]:
-                            for item in os.listdir(expanded_dir):
-                                item_path = os.path.join(expanded_dir, item)
-                                try:
-                                    if os.path.isfile(item_path):
-                                        size = os.path.getsize(item_path)
-                                        os.remove(item_path)
-                                        cleaned_size += size
-                                    elif os.path.isdir(item_path):
-                                        size = self._calculate_dir_size(item_path)
-                                        shutil.rmtree(item_path, ignore_errors=True)
-                                        cleaned_size += size
-                                except:
-                                    pass
-                        else:
-                            size = self._calculate_dir_size(expanded_dir)
-                            shutil.rmtree(expanded_dir, ignore_errors=True)
-                            cleaned_size += size
+            for path in self.expand_directory(directory):
+                # Para directorios importantes, solo limpiar el contenido
+                if path in self.eviction_plans:
+                    # Política de cachés: borrar solo los archivos elegidos en el análisis
+                    cleaned_size += apply_cache_eviction(path, self.eviction_plans[path], progress)
+                elif directory in CLEANUP_CACHE_DIRECTORIES and os.path.isdir(path):
+                    for item in os.listdir(path):
+                        cleaned_size += delete_tree(os.path.join(path, item), progress)
+                else:
+                    cleaned_size += delete_tree(path, progress)
         except Exception as e:
             print(f"Error limpiando {directory}: {e}")
         
@@ -1314,7 +2684,7 @@ class AntivirusWindow(Adw.Window):
         """Instala ClamAV en hilo separado."""
         try:
             # Primero intentar corregir dependencias rotas
-            GLib.idle_add(self.update_status_clam, "Corrigiendo dependencias...")
+            ui_bus.call(self.update_status_clam, "Corrigiendo dependencias...")
             fix_process = subprocess.Popen(pkg_manager.fix_broken(),
                                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
             
@@ -1323,18 +2693,18 @@ class AntivirusWindow(Adw.Window):
                 if output == '' and fix_process.poll() is not None:
                     break
                 if output:
-                    GLib.idle_add(self.update_install_progress)
+                    ui_bus.step(self.update_install_progress)
             
             fix_process.communicate()
             
             # Actualizar repositorios
-            GLib.idle_add(self.update_status_clam, "Actualizando repositorios...")
+            ui_bus.call(self.update_status_clam, "Actualizando repositorios...")
             update_process = subprocess.Popen(pkg_manager.update_cache(),
                                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
             update_process.communicate()
             
             # Instalar ClamAV
-            GLib.idle_add(self.update_status_clam, "Instalando ClamAV...")
+            ui_bus.call(self.update_status_clam, "Instalando ClamAV...")
             install_process = subprocess.Popen(pkg_manager.install_clamav(),
                                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
             
@@ -1343,15 +2713,15 @@ class AntivirusWindow(Adw.Window):
                 if output == '' and install_process.poll() is not None:
                     break
                 if output:
-                    GLib.idle_add(self.update_install_progress)
+                    ui_bus.step(self.update_install_progress)
             
             _, stderr = install_process.communicate()
             
             if install_process.returncode == 0:
-                GLib.idle_add(self.install_clam_complete, True)
+                ui_bus.call(self.install_clam_complete, True)
             else:
                 # Si falla, intentar una vez más con autoremove y fix
-                GLib.idle_add(self.update_status_clam, "Reintentando instalación...")
+                ui_bus.call(self.update_status_clam, "Reintentando instalación...")
                 
                 # Limpiar paquetes huérfanos
                 subprocess.run(pkg_manager.autoremove(), 
@@ -1367,27 +2737,27 @@ class AntivirusWindow(Adw.Window):
                     if output == '' and retry_process.poll() is not None:
                         break
                     if output:
-                        GLib.idle_add(self.update_install_progress)
+                        ui_bus.step(self.update_install_progress)
                 
                 _, retry_stderr = retry_process.communicate()
                 
                 if retry_process.returncode == 0:
-                    GLib.idle_add(self.install_clam_complete, True)
+                    ui_bus.call(self.install_clam_complete, True)
                 else:
-                    GLib.idle_add(self.install_clam_complete, False, f"Error original: {stderr}\nError reintento: {retry_stderr}")
+                    ui_bus.call(self.install_clam_complete, False, f"Error original: {stderr}\nError reintento: {retry_stderr}")
                 
         except Exception as e:
-            GLib.idle_add(self.install_clam_complete, False, str(e))
+            ui_bus.call(self.install_clam_complete, False, str(e))
 
     def update_status_clam(self, message):
         """Actualiza el mensaje de estado durante la instalación."""
         self.status_label.set_text(message)
         return False
 
-    def update_install_progress(self):
+    def update_install_progress(self, steps=1):
         """Actualiza la barra de progreso de instalación."""
         current = self.progress_bar.get_fraction()
-        new_value = min(1.0, current + 0.02)
+        new_value = min(1.0, current + 0.02 * steps)
         self.progress_bar.set_fraction(new_value)
         return False
 
@@ -1428,22 +2798,22 @@ class AntivirusWindow(Adw.Window):
                 if output == '' and process.poll() is not None:
                     break
                 if output:
-                    GLib.idle_add(self.update_definitions_progress)
+                    ui_bus.step(self.update_definitions_progress)
             
             _, stderr = process.communicate()
             
             if process.returncode == 0:
-                GLib.idle_add(self.update_definitions_complete, True)
+                ui_bus.call(self.update_definitions_complete, True)
             else:
-                GLib.idle_add(self.update_definitions_complete, False, stderr)
+                ui_bus.call(self.update_definitions_complete, False, stderr)
                 
         except Exception as e:
-            GLib.idle_add(self.update_definitions_complete, False, str(e))
+            ui_bus.call(self.update_definitions_complete, False, str(e))
 
-    def update_definitions_progress(self):
+    def update_definitions_progress(self, steps=1):
         """Actualiza el progreso de actualización de definiciones."""
         current = self.progress_bar.get_fraction()
-        new_value = min(1.0, current + 0.05)
+        new_value = min(1.0, current + 0.05 * steps)
         self.progress_bar.set_fraction(new_value)
         return False
 
@@ -1512,7 +2882,7 @@ class AntivirusWindow(Adw.Window):
             
             cmd.extend(scan_paths)
             
-            GLib.idle_add(self.append_result, f"Ejecutando: {' '.join(cmd)}\n\n")
+            ui_bus.text(self.append_result, f"Ejecutando: {' '.join(cmd)}\n\n")
             
             self.scan_process = subprocess.Popen(cmd, stdout=subprocess.PIPE, 
                                                stderr=subprocess.PIPE, universal_newlines=True)
@@ -1530,27 +2900,27 @@ class AntivirusWindow(Adw.Window):
                     
                     # Actualizar progreso cada 100 archivos
                     if scanned_files % 100 == 0:
-                        GLib.idle_add(self.update_scan_progress)
+                        ui_bus.step(self.update_scan_progress)
                     
                     # Mostrar archivos infectados
                     if "FOUND" in line:
                         infected_files.append(line)
-                        GLib.idle_add(self.append_result, f"🦠 INFECTADO: {line}\n")
+                        ui_bus.text(self.append_result, f"🦠 INFECTADO: {line}\n")
                     elif scanned_files % 1000 == 0:  # Mostrar progreso cada 1000 archivos
-                        GLib.idle_add(self.append_result, f"Analizados: {scanned_files} archivos...\n")
+                        ui_bus.text(self.append_result, f"Analizados: {scanned_files} archivos...\n")
             
             _, stderr = self.scan_process.communicate()
             
-            GLib.idle_add(self.scan_complete, len(infected_files), scanned_files, stderr)
+            ui_bus.call(self.scan_complete, len(infected_files), scanned_files, stderr)
             
         except Exception as e:
-            GLib.idle_add(self.scan_error, str(e))
+            ui_bus.call(self.scan_error, str(e))
 
-    def update_scan_progress(self):
+    def update_scan_progress(self, steps=1):
         """Actualiza el progreso del análisis."""
         current = self.progress_bar.get_fraction()
         # Progreso más lento para análisis largos
-        new_value = min(0.95, current + 0.01)
+        new_value = min(0.95, current + 0.01 * steps)
         self.progress_bar.set_fraction(new_value)
         return False
 
@@ -1631,6 +3001,275 @@ class AntivirusWindow(Adw.Window):
         GLib.idle_add(self.append_result, f"\n❌ Error: {error_msg}\n")
         return False
 
+BREW_LOGO_URL = "https://upload.wikimedia.org/wikipedia/commons/3/34/Homebrew_logo.png"
+BREW_LOGO_PATH = os.path.join(APP_CACHE_DIR, "homebrew_logo.png")
+
+class IconCache:
+    """Caché de iconos compartida por todas las ventanas.
+
+    Cada archivo se decodifica una sola vez en un Gdk.Texture que reutilizan
+    todas las filas, y los iconos remotos se descargan fuera del hilo de la UI.
+    """
+    RETRY_INTERVAL = 600  # Segundos antes de reintentar una descarga fallida
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.textures = {}  # ruta -> (mtime_ns, textura)
+        self.downloading = set()
+        self.failed = {}  # ruta -> momento del último fallo
+
+    def get_texture(self, path):
+        """Devuelve la textura del archivo o None si no existe o no se puede leer."""
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self.textures.get(path)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+        try:
+            texture = Gdk.Texture.new_from_filename(path)
+        except Exception as e:
+            print(f"No se pudo cargar el icono {path}: {e}")
+            return None
+        self.textures[path] = (mtime_ns, texture)
+        return texture
+
+    def fetch_async(self, url, path, callback=None):
+        """Descarga un icono en segundo plano y avisa en el hilo principal al terminar."""
+        with self.lock:
+            if path in self.downloading:
+                return
+            # Sin conexión cada fila volvería a intentarlo: esperar antes de reintentar
+            if time.time() - self.failed.get(path, 0) < self.RETRY_INTERVAL:
+                return
+            self.downloading.add(path)
+
+        def download_thread():
+            ok = False
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                response = requests.get(url, timeout=10)
+                if response.status_code == 200:
+                    tmp_path = path + ".tmp"
+                    with open(tmp_path, 'wb') as f:
+                        f.write(response.content)
+                    os.replace(tmp_path, path)
+                    ok = True
+                    if callback:
+                        GLib.idle_add(callback)
+                else:
+                    print(f"No se pudo descargar el icono {url}: HTTP {response.status_code}")
+            except Exception as e:
+                print(f"No se pudo descargar el icono {url}: {e}")
+            finally:
+                with self.lock:
+                    self.downloading.discard(path)
+                    if ok:
+                        self.failed.pop(path, None)
+                    else:
+                        self.failed[path] = time.time()
+
+        thread = threading.Thread(target=download_thread)
+        thread.daemon = True
+        thread.start()
+
+icon_cache = IconCache()
+
+DESKTOP_ENTRIES_DIR = "/usr/share/applications"
+
+class DesktopEntryIndex:
+    """Índice de los archivos .desktop indexado por ruta y mtime.
+
+    Se guarda en ~/.cache/appinstall y solo se vuelven a leer los archivos que
+    han cambiado, así detectar AppImages y PWAs no obliga a abrirlos todos.
+    """
+    FORMAT_VERSION = 1
+    # Claves de [Desktop Entry] que se guardan en el índice
+    KEYS = ("Name", "Exec", "Icon", "X-AppInstall")
+
+    def __init__(self, directory=DESKTOP_ENTRIES_DIR):
+        self.directory = directory
+        self.cache = CacheFile("desktop_entries.json", self.FORMAT_VERSION, "el índice de archivos .desktop")
+        self.lock = threading.Lock()
+        # ruta -> {'mtime_ns', 'size', 'keys', 'kind'}
+        self.entries = None
+
+    @classmethod
+    def parse_desktop_entry(cls, path):
+        """Lee solo las claves de la sección [Desktop Entry] que interesan."""
+        keys = {}
+        in_entry = False
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if line.startswith('['):
+                    if in_entry:
+                        break  # Fin de [Desktop Entry]: el resto no interesa
+                    in_entry = line == "[Desktop Entry]"
+                    continue
+                if in_entry and '=' in line:
+                    key, value = line.split('=', 1)
+                    key = key.strip()
+                    if key in cls.KEYS:
+                        keys[key] = value.strip()
+        return keys
+
+    @staticmethod
+    def detect_kind(app_name, keys):
+        """Devuelve "pwa", "appimage" o None según las marcas de AppInstall."""
+        marker = keys.get("X-AppInstall")
+        if marker == "PWA":
+            return "pwa"
+        if marker == "AppImage":
+            return "appimage"
+        
+        # Formatos antiguos: icono por defecto o binario e icono propios de AppInstall
+        exec_line = keys.get("Exec", "")
+        icon = keys.get("Icon", "")
+        if "/usr/bin/" in exec_line and "appimage.png" in icon:
+            return "appimage"
+        if exec_line.startswith(f"/usr/bin/{app_name}") and icon.startswith(f"/usr/share/pixmaps/{app_name}"):
+            return "appimage"
+        return None
+
+    def scan(self):
+        """Actualiza el índice releyendo solo los archivos nuevos o modificados."""
+        with self.lock:
+            if self.entries is None:
+                self.entries = self.cache.load(self.directory) or {}
+            
+            current = {}
+            changed = False
+            try:
+                with os.scandir(self.directory) as it:
+                    for entry in it:
+                        if not entry.name.endswith(".desktop"):
+                            continue
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        cached = self.entries.get(entry.path)
+                        if cached and cached['mtime_ns'] == st.st_mtime_ns and cached['size'] == st.st_size:
+                            current[entry.path] = cached
+                            continue
+                        current[entry.path] = self._read_entry(entry.path, st)
+                        changed = True
+            except FileNotFoundError:
+                pass
+            
+            changed = changed or len(current) != len(self.entries)
+            self.entries = current
+            if changed:
+                self.cache.save(self.directory, self.entries)
+            return dict(current)
+
+    def update_paths(self, paths):
+        """Actualiza solo las rutas indicadas (p. ej. tras un aviso de un monitor)."""
+        with self.lock:
+            if self.entries is None:
+                self.entries = self.cache.load(self.directory) or {}
+            
+            changed = False
+            for path in paths:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    changed = self.entries.pop(path, None) is not None or changed
+                    continue
+                cached = self.entries.get(path)
+                if cached and cached['mtime_ns'] == st.st_mtime_ns and cached['size'] == st.st_size:
+                    continue
+                self.entries[path] = self._read_entry(path, st)
+                changed = True
+            if changed:
+                self.cache.save(self.directory, self.entries)
+            return changed
+
+    def _read_entry(self, path, st):
+        try:
+            keys = self.parse_desktop_entry(path)
+        except OSError:
+            keys = {}
+        app_name = os.path.basename(path)[:-len(".desktop")]
+        return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'keys': keys,
+                'kind': self.detect_kind(app_name, keys)}
+
+    def get_appinstall_apps(self, rescan=True):
+        """Devuelve (pwas, appimages) instaladas por AppInstall."""
+        if rescan or self.entries is None:
+            entries = self.scan()
+        else:
+            with self.lock:
+                entries = dict(self.entries)
+        pwas = []
+        appimages = []
+        for path, record in sorted(entries.items()):
+            app_name = os.path.basename(path)[:-len(".desktop")]
+            if record['kind'] == "pwa":
+                pwas.append(app_name)
+            elif record['kind'] == "appimage":
+                appimages.append(app_name)
+        return pwas, appimages
+
+desktop_index = DesktopEntryIndex()
+
+def set_appstream_icon(image, metadata, fallback_icon):
+    """Muestra en la imagen el icono de AppStream o, si no hay, el icono de respaldo."""
+    texture = icon_cache.get_texture(metadata[2]) if metadata and metadata[2] else None
+    if texture:
+        image.set_from_paintable(texture)
+        image.set_pixel_size(24)
+    elif metadata and metadata[3]:
+        image.set_from_icon_name(metadata[3])
+        image.set_pixel_size(24)
+    else:
+        image.set_from_icon_name(fallback_icon)
+
+def get_app_type_text(kind):
+    """Texto que describe el tipo de una aplicación instalada."""
+    if kind == "appimage":
+        return _("AppImage")
+    elif kind == "pwa":
+        return _("PWA (Web App)")
+    elif kind == "brew":
+        return _("Paquete Homebrew")
+    return _("Paquete del sistema")
+
+# Orden en el que se muestran los tipos de aplicación en la lista de instaladas
+APP_KIND_ORDER = ("pwa", "appimage", "brew", "system")
+
+# Orígenes de la lista de instaladas: (tipos que aporta, segundos de plazo)
+APP_SOURCES = (
+    (("pwa", "appimage"), 10),
+    (("brew",), 20),
+    (("system",), 30),
+)
+
+class InstalledAppItem(GObject.Object):
+    """Elemento del modelo de la lista de aplicaciones instaladas."""
+    def __init__(self, name, kind):
+        super().__init__()
+        self.name = name
+        self.kind = kind  # "pwa", "appimage", "brew" o "system"
+        self.selected = False
+        self.update_search_key()
+
+    def get_appstream(self):
+        """Nombre, resumen e icono del catálogo AppStream (solo paquetes del sistema)."""
+        return appstream_catalog.lookup(self.name) if self.kind == "system" else None
+
+    def update_search_key(self):
+        """Precalcula la clave de búsqueda para no recalcularla en cada pulsación."""
+        search_key = f"{self.name}\n{get_app_type_text(self.kind)}"
+        metadata = self.get_appstream()
+        if metadata:
+            search_key += f"\n{metadata[0]}\n{metadata[1]}"
+        self.search_key = search_key.lower()
+
 class InstalledAppsWindow(Adw.Window):
     def __init__(self, parent):
         super().__init__()
@@ -1716,15 +3355,23 @@ class InstalledAppsWindow(Adw.Window):
         
         self.stack.add_named(loading_box, "loading")
 
-        # 2. Estado de Lista (ScrolledWindow + ListBox)
+        # 2. Estado de Lista (ScrolledWindow + ListView)
         scrolled_window = Gtk.ScrolledWindow()
         scrolled_window.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
         scrolled_window.set_min_content_height(300)
         
-        self.listbox = Gtk.ListBox()
-        self.listbox.set_selection_mode(Gtk.SelectionMode.NONE)
-        self.listbox.set_filter_func(self.filter_func)
-        scrolled_window.set_child(self.listbox)
+        # La lista es virtual: solo se crean widgets para las filas visibles
+        self.apps_store = Gio.ListStore(item_type=InstalledAppItem)
+        self.filter_text = ""
+        self.apps_filter = Gtk.CustomFilter.new(self.filter_func)
+        self.filter_model = Gtk.FilterListModel(model=self.apps_store, filter=self.apps_filter)
+        
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_row_setup)
+        factory.connect("bind", self.on_row_bind)
+        
+        self.listview = Gtk.ListView(model=Gtk.NoSelection(model=self.filter_model), factory=factory)
+        scrolled_window.set_child(self.listview)
         
         self.stack.add_named(scrolled_window, "list")
 
@@ -1745,6 +3392,15 @@ class InstalledAppsWindow(Adw.Window):
         
         self.stack.add_named(no_results_box, "empty")
         
+        # Botón para desinstalar de una vez todas las aplicaciones marcadas
+        self.selected_items = set()
+        self.load_generation = 0
+        self.batch_button = Gtk.Button(label=_("Desinstalar seleccionadas"))
+        self.batch_button.add_css_class("destructive-button")
+        self.batch_button.set_sensitive(False)
+        self.batch_button.connect("clicked", self.on_batch_uninstall_clicked)
+        main_box.append(self.batch_button)
+        
         # Barra de progreso para desinstalación
         self.progress_bar = Gtk.ProgressBar()
         self.progress_bar.add_css_class("progress-bar")
@@ -1758,50 +3414,103 @@ class InstalledAppsWindow(Adw.Window):
         
         # Cargar aplicaciones
         self.load_installed_apps()
+        
+        # Vigilar los lanzadores para actualizar la lista al momento. Los
+        # binarios e iconos no cambian la detección, que solo lee el .desktop
+        self.monitors = []
+        self.pending_monitor_paths = set()
+        self.monitor_timeout_id = None
+        try:
+            monitor = Gio.File.new_for_path(DESKTOP_ENTRIES_DIR).monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None)
+            monitor.connect("changed", self.on_apps_dir_changed)
+            self.monitors.append(monitor)
+        except Exception as e:
+            print(f"DEBUG: No se pudo vigilar {DESKTOP_ENTRIES_DIR}: {e}")
+        # Los paquetes del sistema muestran su nombre e icono en cuanto el catálogo AppStream esté listo
+        appstream_catalog.add_listener(self.on_appstream_ready)
+        self.connect("close-request", self.on_close_request)
     
     def load_installed_apps(self):
+        # Las cargas anteriores que sigan en marcha se descartan
+        self.load_generation += 1
+        
         # Limpiar la lista actual
-        child = self.listbox.get_first_child()
-        while child:
-            next_child = child.get_next_sibling()
-            self.listbox.remove(child)
-            child = next_child
+        self.apps_store.remove_all()
+        self.selected_items.clear()
+        self.update_batch_button()
             
         # Mostrar estado de carga
         self.stack.set_visible_child_name("loading")
         
         # Iniciar un hilo para cargar las aplicaciones
-        thread = threading.Thread(target=self.load_apps_thread)
+        thread = threading.Thread(target=self.load_apps_thread, args=(self.load_generation,))
         thread.daemon = True
         thread.start()
     
-    def load_apps_thread(self):
-        try:
-            # Obtener paquetes instalados
-            packages = []
-            appimages = []
-            brew_packages = []
+    def load_apps_thread(self, generation):
+        # Consultar todos los orígenes a la vez y mostrar cada uno en cuanto llegue
+        finished = queue.Queue()
+        deadlines = {}
+        for kinds, timeout in APP_SOURCES:
+            deadlines[kinds] = time.time() + timeout
+            thread = threading.Thread(target=self.load_source_thread, args=(kinds, finished))
+            thread.daemon = True
+            thread.start()
+        
+        failed = 0
+        pending = set(deadlines)
+        while pending and generation == self.load_generation:
+            try:
+                kinds, all_apps = finished.get(timeout=max(0, min(deadlines[k] for k in pending) - time.time()))
+            except queue.Empty:
+                # Abandonar los orígenes que han superado su plazo
+                now = time.time()
+                for kinds in [k for k in pending if deadlines[k] <= now]:
+                    print(f"DEBUG: La carga de {', '.join(kinds)} ha superado su plazo")
+                    pending.discard(kinds)
+                    failed += 1
+                continue
             
-            # Obtener paquetes del sistema
+            if kinds not in pending:
+                continue
+            pending.discard(kinds)
+            if all_apps is None:
+                failed += 1
+                continue
+            GLib.idle_add(self.add_source_apps, generation, kinds, all_apps)
+        
+        GLib.idle_add(self.finish_loading_apps, generation, failed == len(APP_SOURCES))
+    
+    def load_source_thread(self, kinds, finished):
+        try:
+            finished.put((kinds, self.collect_installed_apps(kinds)))
+        except Exception as e:
+            print(f"Error al cargar aplicaciones ({', '.join(kinds)}): {e}")
+            finished.put((kinds, None))
+    
+    def collect_installed_apps(self, kinds):
+        """Devuelve una lista de (nombre, tipo) con las aplicaciones de los tipos indicados."""
+        packages = []
+        appimages = []
+        brew_packages = []
+        pwas = []
+        
+        # Obtener paquetes del sistema
+        if "system" in kinds:
             try:
                 packages = pkg_manager.list_installed()
             except Exception as e:
                 print(f"Error al obtener paquetes: {e}")
-            
-            # Obtener paquetes de Homebrew
+        
+        # Obtener paquetes de Homebrew
+        if "brew" in kinds:
             if HAS_BREW:
-                print(f"DEBUG: Intentando listar paquetes de Homebrew usando {BREW_PATH}")
+                print(f"DEBUG: Intentando listar paquetes de Homebrew en {BREW_PREFIX}")
                 try:
-                    # Listar fórmulas y casks
-                    output = subprocess.check_output([BREW_PATH, 'list', '--formula'], 
-                                                   timeout=15, stderr=subprocess.STDOUT).decode('utf-8')
-                    formulas = [line.strip() for line in output.split('\n') if line.strip()]
+                    # Listar fórmulas y casks directamente desde Cellar y Caskroom
+                    formulas, casks = brew_metadata.list_installed()
                     brew_packages.extend(formulas)
                     print(f"DEBUG: Encontradas {len(formulas)} fórmulas de Homebrew")
-                    
-                    output_cask = subprocess.check_output([BREW_PATH, 'list', '--cask'], 
-                                                        timeout=15, stderr=subprocess.STDOUT).decode('utf-8')
-                    casks = [line.strip() for line in output_cask.split('\n') if line.strip()]
                     brew_packages.extend(casks)
                     print(f"DEBUG: Encontrados {len(casks)} casks de Homebrew")
                 except Exception as e:
@@ -1809,244 +3518,325 @@ class InstalledAppsWindow(Adw.Window):
             else:
                 print("DEBUG: Homebrew no detectado (HAS_BREW es False)")
 
-            # Obtener AppImages y PWAs
-            pwas = []
-            desktop_dir = "/usr/share/applications"
-            if os.path.exists(desktop_dir):
-                for filename in os.listdir(desktop_dir):
-                    if filename.endswith(".desktop"):
-                        desktop_path = os.path.join(desktop_dir, filename)
-                        try:
-                            with open(desktop_path, 'r') as f:
-                                content = f.read()
-                                app_name = filename.replace(".desktop", "")
-
-                                # Detectar si es de AppInstall:
-                                # 1. Tiene la marca nueva (AppImage o PWA)
-                                # 2. Tiene el icono por defecto antiguo
-                                # 3. Tiene el patrón de ruta de binario e icono personalizado de AppInstall
-                                if "X-AppInstall=PWA" in content:
-                                    pwas.append(app_name)
-                                else:
-                                    is_appinstall_app = (
-                                        "X-AppInstall=AppImage" in content or 
-                                        ("/usr/bin/" in content and "appimage.png" in content) or
-                                        (f"Exec=/usr/bin/{app_name}" in content and f"Icon=/usr/share/pixmaps/{app_name}" in content)
-                                    )
-
-                                    if is_appinstall_app:
-                                        appimages.append(app_name)
-                        except:
-                            pass
-            
-            # Actualizar la UI en lotes para evitar sobrecargar el bucle principal
-            def update_ui_batch(index):
-                # Priorizar: PWA -> AppImage -> Homebrew -> Sistema (APT/DNF)
-                all_apps = []
-                for pw in pwas: all_apps.append((pw, "pwa"))
-                for a in appimages: all_apps.append((a, "appimage"))
-                for b in brew_packages: all_apps.append((b, "brew"))
-                for p in packages: all_apps.append((p, "system"))
-
-                if not all_apps:
-                    self.stack.set_visible_child_name("empty")
-                    return False
-
-                batch_size = 30
-                end_index = min(index + batch_size, len(all_apps))
-                
-                for i in range(index, end_index):
-                    name, type = all_apps[i]
-                    self.add_app_to_list(name, type == "appimage", type == "brew", type == "pwa")
-                
-                if end_index < len(all_apps):
-                    # Programar el siguiente lote
-                    GLib.idle_add(lambda: update_ui_batch(end_index))
-                else:
-                    # Mostrar la lista cuando todo esté cargado
-                    self.stack.set_visible_child_name("list")
-                    # Forzar el filtrado inicial por si había texto en la búsqueda
-                    self.on_search_changed(self.search_entry)
-                
-                return False
-                
-                return False
-            
-            # Programar la actualización de la UI en el hilo principal
-            GLib.idle_add(lambda: update_ui_batch(0))
-            
-        except Exception as e:
-            print(f"Error al cargar aplicaciones: {e}")
-            GLib.idle_add(self.show_error_message)
+        # Obtener AppImages y PWAs desde el índice de archivos .desktop
+        if "pwa" in kinds or "appimage" in kinds:
+            try:
+                pwas, appimages = desktop_index.get_appinstall_apps()
+            except Exception as e:
+                print(f"Error al leer los archivos .desktop: {e}")
+        
+        # Priorizar: PWA -> AppImage -> Homebrew -> Sistema (APT/DNF)
+        all_apps = []
+        if "pwa" in kinds:
+            for pw in pwas: all_apps.append((pw, "pwa"))
+        if "appimage" in kinds:
+            for a in appimages: all_apps.append((a, "appimage"))
+        for b in brew_packages: all_apps.append((b, "brew"))
+        for p in packages: all_apps.append((p, "system"))
+        return all_apps
+    
+    def on_close_request(self, window):
+        appstream_catalog.remove_listener(self.on_appstream_ready)
+        for monitor in self.monitors:
+            monitor.cancel()
+        self.monitors = []
+        if self.monitor_timeout_id:
+            GLib.source_remove(self.monitor_timeout_id)
+            self.monitor_timeout_id = None
+        return False
+    
+    def on_apps_dir_changed(self, monitor, file, other_file, event_type):
+        """Anota el .desktop afectado por el cambio y agrupa los avisos seguidos."""
+        for changed_file in (file, other_file):
+            if changed_file is None:
+                continue
+            path = changed_file.get_path()
+            if not path:
+                continue
+            if path.endswith(".desktop"):
+                self.pending_monitor_paths.add(path)
+        
+        if self.pending_monitor_paths and self.monitor_timeout_id is None:
+            self.monitor_timeout_id = GLib.timeout_add(300, self.apply_monitor_changes)
+    
+    def apply_monitor_changes(self):
+        self.monitor_timeout_id = None
+        paths = list(self.pending_monitor_paths)
+        self.pending_monitor_paths.clear()
+        
+        def update_thread():
+            try:
+                if not desktop_index.update_paths(paths):
+                    return
+                pwas, appimages = desktop_index.get_appinstall_apps(rescan=False)
+            except Exception as e:
+                print(f"Error al actualizar los archivos .desktop: {e}")
+                return
+            all_apps = [(pw, "pwa") for pw in pwas] + [(a, "appimage") for a in appimages]
+            GLib.idle_add(self.apply_apps_delta, ("pwa", "appimage"), all_apps)
+        
+        thread = threading.Thread(target=update_thread)
+        thread.daemon = True
+        thread.start()
+        return False
+    
+    def add_source_apps(self, generation, kinds, all_apps):
+        """Añade al modelo las aplicaciones de un origen en su posición."""
+        if generation != self.load_generation:
+            return False
+        self.apply_apps_delta(kinds, all_apps)
+        
+        # Mostrar la lista en cuanto haya algo y forzar el filtrado por si había texto en la búsqueda
+        if self.stack.get_visible_child_name() == "loading" and self.apps_store.get_n_items():
+            self.stack.set_visible_child_name("list")
+            self.on_search_changed(self.search_entry)
+        return False
+    
+    def finish_loading_apps(self, generation, all_failed):
+        if generation != self.load_generation:
+            return False
+        if self.apps_store.get_n_items():
+            return False
+        if all_failed:
+            self.show_error_message()
+        else:
+            self.show_no_apps_message()
+        return False
     
-    def add_app_to_list(self, package_name, is_appimage=False, is_brew=False, is_pwa=False):
-        """Añadir una aplicación a la lista"""
-        row = Gtk.ListBoxRow()
-        row.add_css_class("list-row")
+    def remove_app_item(self, package_name, kind):
+        """Quita una aplicación del modelo sin recargar la lista."""
+        for position in range(self.apps_store.get_n_items()):
+            item = self.apps_store.get_item(position)
+            if item.name == package_name and item.kind == kind:
+                self.apps_store.remove(position)
+                self.selected_items.discard(item)
+                break
+        self.update_batch_button()
+        self.check_filter_results()
+    
+    def refresh_apps_delta(self, kinds):
+        """Vuelve a leer solo los tipos indicados y aplica las diferencias al modelo."""
+        def refresh_thread():
+            try:
+                all_apps = self.collect_installed_apps(kinds)
+            except Exception as e:
+                print(f"Error al actualizar aplicaciones: {e}")
+                return
+            GLib.idle_add(self.apply_apps_delta, kinds, all_apps)
+        
+        thread = threading.Thread(target=refresh_thread)
+        thread.daemon = True
+        thread.start()
+    
+    def apply_apps_delta(self, kinds, all_apps):
+        """Elimina las aplicaciones que ya no existen y añade las nuevas en su grupo."""
+        current = set(all_apps)
+        known = set()
+        
+        # Recorrer hacia atrás para que las posiciones sigan siendo válidas al borrar
+        for position in range(self.apps_store.get_n_items() - 1, -1, -1):
+            item = self.apps_store.get_item(position)
+            if item.kind not in kinds:
+                continue
+            key = (item.name, item.kind)
+            if key in current:
+                known.add(key)
+            else:
+                self.apps_store.remove(position)
+                self.selected_items.discard(item)
+        
+        new_items = {}
+        for name, kind in all_apps:
+            if (name, kind) not in known:
+                new_items.setdefault(kind, []).append(InstalledAppItem(name, kind))
+        
+        for kind, items in new_items.items():
+            # Insertar al final del grupo de su tipo para mantener el orden PWA -> Sistema.
+            # El modelo está ordenado por tipo, así que basta una búsqueda binaria.
+            rank = APP_KIND_ORDER.index(kind)
+            low, high = 0, self.apps_store.get_n_items()
+            while low < high:
+                middle = (low + high) // 2
+                if APP_KIND_ORDER.index(self.apps_store.get_item(middle).kind) > rank:
+                    high = middle
+                else:
+                    low = middle + 1
+            self.apps_store.splice(low, 0, items)
         
+        self.update_batch_button()
+        if self.stack.get_visible_child_name() != "loading":
+            self.check_filter_results()
+        return False
+    
+    def on_row_setup(self, factory, list_item):
+        """Crea los widgets de una fila (se reutilizan al desplazarse)."""
         hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
+        hbox.add_css_class("list-row")
         hbox.set_margin_top(8)
         hbox.set_margin_bottom(8)
         hbox.set_margin_start(8)
         hbox.set_margin_end(8)
-        row.set_child(hbox)
         
-        # Icono para el tipo de aplicación
-        if is_appimage:
-            icon = Gtk.Image.new_from_icon_name("application-x-executable")
-        elif is_pwa:
-            icon = Gtk.Image.new_from_icon_name("web-browser-symbolic")
-        elif is_brew:
-            # Intentar cargar el logo de Homebrew
-            brew_logo_path = os.path.expanduser("~/.cache/appinstall/homebrew_logo.png")
-            if not os.path.exists(brew_logo_path):
-                # Descargar el logo si no existe
-                try:
-                    os.makedirs(os.path.dirname(brew_logo_path), exist_ok=True)
-                    response = requests.get("https://upload.wikimedia.org/wikipedia/commons/3/34/Homebrew_logo.png", timeout=10)
-                    if response.status_code == 200:
-                        with open(brew_logo_path, 'wb') as f:
-                            f.write(response.content)
-                except:
-                    pass
-            
-            if os.path.exists(brew_logo_path):
-                icon = Gtk.Image.new_from_file(brew_logo_path)
-                icon.set_pixel_size(24)
-            else:
-                icon = Gtk.Image.new_from_icon_name("system-software-install")
-        else:
-            icon = Gtk.Image.new_from_icon_name("package-x-generic")
-            
-        hbox.prepend(icon)
+        # Casilla para marcar la aplicación en la desinstalación por lotes
+        hbox.check = Gtk.CheckButton()
+        hbox.check.set_valign(Gtk.Align.CENTER)
+        hbox.check.app_item = None
+        hbox.check.connect("toggled", self.on_row_check_toggled)
+        hbox.append(hbox.check)
         
-        # Nombre a mostrar
-        display_name = package_name
+        # Icono para el tipo de aplicación
+        hbox.icon = Gtk.Image()
+        hbox.append(hbox.icon)
         
         # Contenedor vertical para nombre y tipo
         vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
         vbox.set_hexpand(True) # Expandir para empujar el botón al final
         
-        label = Gtk.Label(label=display_name, xalign=0)
-        label.add_css_class("title-label")
-        vbox.append(label)
+        hbox.name_label = Gtk.Label(xalign=0)
+        hbox.name_label.add_css_class("title-label")
+        vbox.append(hbox.name_label)
         
-        # Etiqueta para el tipo
-        if is_appimage:
-            type_text = _("AppImage")
-        elif is_pwa:
-            type_text = _("PWA (Web App)")
-        elif is_brew:
-            type_text = _("Paquete Homebrew")
-        else:
-            type_text = _("Paquete del sistema")
-            
-        type_label = Gtk.Label(label=type_text, xalign=0)
-        type_label.add_css_class("subtitle-label")
-        vbox.append(type_label)
+        hbox.type_label = Gtk.Label(xalign=0)
+        hbox.type_label.add_css_class("subtitle-label")
+        vbox.append(hbox.type_label)
         
         hbox.append(vbox)
         
         # Botón de desinstalar con icono
-        button = Gtk.Button()
-        button.set_tooltip_text(_("Desinstalar"))
-        button.add_css_class("destructive-button")
-        button.set_valign(Gtk.Align.CENTER) # Centrar verticalmente respecto al texto
-        
-        button_icon = Gtk.Image.new_from_icon_name("user-trash-symbolic")
-        button.set_child(button_icon)
-        
-        button.connect("clicked", self.on_uninstall_clicked, package_name, is_appimage, is_brew, is_pwa)
-        hbox.append(button)
-        
-        self.listbox.append(row)
+        hbox.button = Gtk.Button()
+        hbox.button.set_tooltip_text(_("Desinstalar"))
+        hbox.button.add_css_class("destructive-button")
+        hbox.button.set_valign(Gtk.Align.CENTER) # Centrar verticalmente respecto al texto
+        hbox.button.set_child(Gtk.Image.new_from_icon_name("user-trash-symbolic"))
+        hbox.button.connect("clicked", self.on_row_uninstall_clicked)
+        hbox.append(hbox.button)
+        
+        list_item.set_child(hbox)
+    
+    def on_row_bind(self, factory, list_item):
+        """Rellena una fila con los datos de su elemento del modelo."""
+        item = list_item.get_item()
+        hbox = list_item.get_child()
+        
+        # Las filas se reciclan: restablecer el tamaño que pudo fijar el logo de Homebrew
+        hbox.icon.set_pixel_size(-1)
+        # Se consulta al enlazar: el catálogo puede terminar de cargarse después de crear el elemento
+        metadata = item.get_appstream()
+        if item.kind == "appimage":
+            hbox.icon.set_from_icon_name("application-x-executable")
+        elif item.kind == "pwa":
+            hbox.icon.set_from_icon_name("web-browser-symbolic")
+        elif item.kind == "brew":
+            # Usar el logo de Homebrew compartido; si falta, se descarga en segundo plano
+            texture = icon_cache.get_texture(BREW_LOGO_PATH)
+            if texture:
+                hbox.icon.set_from_paintable(texture)
+                hbox.icon.set_pixel_size(24)
+            else:
+                hbox.icon.set_from_icon_name("system-software-install")
+                icon_cache.fetch_async(BREW_LOGO_URL, BREW_LOGO_PATH, self.on_brew_logo_ready)
+        else:
+            set_appstream_icon(hbox.icon, metadata, "package-x-generic")
+        
+        if metadata:
+            # Mostrar la identidad real de la aplicación según AppStream
+            display_name, summary = metadata[0], metadata[1]
+            hbox.name_label.set_label(display_name)
+            hbox.type_label.set_label(f"{get_app_type_text(item.kind)} · {summary or item.name}")
+            hbox.set_tooltip_text(item.name)
+        else:
+            hbox.name_label.set_label(item.name)
+            hbox.type_label.set_label(get_app_type_text(item.kind))
+            hbox.set_tooltip_text(None)
+        hbox.button.app_item = item
+        
+        # Evitar que el cambio de estado al reciclar la fila se tome como una selección
+        hbox.check.app_item = None
+        hbox.check.set_active(item.selected)
+        hbox.check.app_item = item
+    
+    def on_appstream_ready(self):
+        """El catálogo AppStream ha cambiado: actualizar nombres, iconos y búsqueda."""
+        n_items = self.apps_store.get_n_items()
+        for position in range(n_items):
+            self.apps_store.get_item(position).update_search_key()
+        self.apps_store.items_changed(0, n_items, n_items)
+        if self.filter_text:
+            self.apps_filter.changed(Gtk.FilterChange.DIFFERENT)
+            self.check_filter_results()
+        return False
+    
+    def on_brew_logo_ready(self):
+        # Volver a enlazar las filas para que las de Homebrew muestren el logo
+        n_items = self.apps_store.get_n_items()
+        self.apps_store.items_changed(0, n_items, n_items)
+        return False
+    
+    def on_row_uninstall_clicked(self, button):
+        item = button.app_item
+        self.on_uninstall_clicked(button, item.name, item.kind == "appimage", item.kind == "brew", item.kind == "pwa")
+    
+    def on_row_check_toggled(self, check):
+        item = check.app_item
+        if item is None:
+            return
+        item.selected = check.get_active()
+        if item.selected:
+            self.selected_items.add(item)
+        else:
+            self.selected_items.discard(item)
+        self.update_batch_button()
+    
+    def update_batch_button(self):
+        count = len(self.selected_items)
+        if count:
+            self.batch_button.set_label(_("Desinstalar seleccionadas ({})").format(count))
+        else:
+            self.batch_button.set_label(_("Desinstalar seleccionadas"))
+        self.batch_button.set_sensitive(count > 0)
+        return False
     
     # Mensaje de que no hay aplicaciones instaladas en el sistema (clara prueba de que está habiendo un error)
     def show_no_apps_message(self):
-        row = Gtk.ListBoxRow()
-        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=8)
-        box.set_margin_top(24)
-        box.set_margin_bottom(24)
-        
-        icon = Gtk.Image.new_from_icon_name("dialog-information-symbolic")
-        box.append(icon)
-        
-        label = Gtk.Label(label=_("No he encontrado aplicaciones instaladas en tu sistema"))
-        label.get_style_context().add_class("title-label")
-        box.append(label)
-        
-        row.add(box)
-        self.listbox.add(row)
+        self.no_results_label.set_text(_("No he encontrado aplicaciones instaladas en tu sistema"))
+        self.stack.set_visible_child_name("empty")
         return False
     
     def show_error_message(self):
-        # Eliminar el spinner si existe
-        child = self.listbox.get_first_child()
-        while child:
-            next_child = child.get_next_sibling()
-            child_widget = child.get_child()
-            if isinstance(child_widget, Gtk.Box):
-                first_grandchild = child_widget.get_first_child()
-                if isinstance(first_grandchild, Gtk.Spinner):
-                    self.listbox.remove(child)
-                    break
-            child = next_child
-        
-        row = Gtk.ListBoxRow()
-        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=8)
-        box.set_margin_top(24)
-        box.set_margin_bottom(24)
-        
-        icon = Gtk.Image.new_from_icon_name("dialog-error-symbolic")
-        box.append(icon)
-        
-        label = Gtk.Label(label=_("No he podido encontrar aplicaciones instaladas en tu sistema"))
-        label.get_style_context().add_class("title-label")
-        box.append(label)
-        
-        row.add(box)
-        self.listbox.add(row)
+        self.no_results_label.set_text(_("No he podido encontrar aplicaciones instaladas en tu sistema"))
+        self.stack.set_visible_child_name("empty")
         return False
     
     def on_search_changed(self, entry):
-        self.listbox.invalidate_filter()
-        # Verificar si hay resultados visibles después de invalidar el filtro
-        GLib.idle_add(self.check_filter_results)
+        text = entry.get_text().lower()
+        previous = self.filter_text
+        self.filter_text = text
+        
+        # Indicar a GTK cómo cambia el filtro para que solo reevalúe lo necesario
+        if text == previous:
+            change = None
+        elif previous in text:
+            change = Gtk.FilterChange.MORE_STRICT
+        elif text in previous:
+            change = Gtk.FilterChange.LESS_STRICT
+        else:
+            change = Gtk.FilterChange.DIFFERENT
+        if change is not None:
+            self.apps_filter.changed(change)
+        # Verificar si hay resultados visibles después de cambiar el filtro
+        self.check_filter_results()
 
     def check_filter_results(self):
-        has_visible = False
-        child = self.listbox.get_first_child()
-        while child:
-            if child.is_visible() and child.get_child():
-                has_visible = True
-                break
-            child = child.get_next_sibling()
-        
-        if not has_visible:
+        if self.filter_model.get_n_items() == 0:
+            self.no_results_label.set_text(_("No he encontrado nada que coincida"))
             self.stack.set_visible_child_name("empty")
         else:
             self.stack.set_visible_child_name("list")
         return False
     
-    def filter_func(self, row):
-        text = self.search_entry.get_text().lower()
-        if not text:
-            return True
-        
-        # Buscar en el título de la aplicación
-        box = row.get_child()
-        if box and isinstance(box, Gtk.Box):
-            child = box.get_first_child()
-            while child:
-                if isinstance(child, Gtk.Box) and child.get_orientation() == Gtk.Orientation.VERTICAL:
-                    label_child = child.get_first_child()
-                    while label_child:
-                        if isinstance(label_child, Gtk.Label) and hasattr(label_child, 'get_text'):
-                            if text in label_child.get_text().lower():
-                                return True
-                        label_child = label_child.get_next_sibling()
-                child = child.get_next_sibling()
-        return False
+    def filter_func(self, item):
+        # Buscar en el nombre y en el tipo de la aplicación
+        return not self.filter_text or self.filter_text in item.search_key
     
     # Aviso desinstalación
     def on_uninstall_clicked(self, button, package_name, is_appimage=False, is_brew=False, is_pwa=False):
@@ -2080,6 +3870,127 @@ class InstalledAppsWindow(Adw.Window):
         except Exception as e:
             print(f"Dialog error: {e}")
     
+    def on_batch_uninstall_clicked(self, button):
+        items = sorted(self.selected_items, key=lambda item: (APP_KIND_ORDER.index(item.kind), item.name))
+        if not items:
+            return
+        
+        names = ", ".join(item.name for item in items[:10])
+        if len(items) > 10:
+            names += ", …"
+        dialog = Adw.AlertDialog(
+            heading=_("Confirmación"),
+            body=_("¿Deseas desinstalar {} aplicaciones?").format(len(items)) + f"\n\n{names}"
+        )
+        dialog.add_response("no", _("No"))
+        dialog.add_response("yes", _("Sí"))
+        dialog.set_response_appearance("yes", Adw.ResponseAppearance.DESTRUCTIVE)
+        dialog.set_default_response("no")
+        dialog.set_close_response("no")
+        
+        dialog.choose(self, None, self._on_batch_uninstall_dialog_response, items)
+    
+    def _on_batch_uninstall_dialog_response(self, dialog, result, items):
+        try:
+            response = dialog.choose_finish(result)
+            if response == "yes":
+                self.uninstall_batch(items)
+        except Exception as e:
+            print(f"Dialog error: {e}")
+    
+    def build_batch_uninstall_commands(self, items):
+        """Agrupa la desinstalación en una orden privilegiada y, si hace falta, otra de Homebrew."""
+        local_paths = []
+        system_packages = []
+        brew_packages = []
+        for item in items:
+            if item.kind == "appimage":
+                local_paths.append(shlex.quote(f"/usr/bin/{item.name}"))
+            if item.kind in ("appimage", "pwa"):
+                local_paths.append(shlex.quote(f"/usr/share/applications/{item.name}.desktop"))
+                # El comodín de los iconos tiene que quedar fuera de las comillas
+                local_paths.append(shlex.quote(f"/usr/share/pixmaps/{item.name}") + ".*")
+            elif item.kind == "brew":
+                brew_packages.append(item.name)
+            elif item.kind == "system":
+                system_packages.append(item.name)
+        
+        commands = []
+        if local_paths:
+            # Un único pkexec para AppImages, PWAs y paquetes del sistema
+            script = "rm -f -- " + " ".join(local_paths)
+            if system_packages:
+                # Quitar el pkexec de la orden del gestor: ya se ejecuta dentro del script
+                script += " && " + shlex.join(pkg_manager.uninstall_multiple(system_packages)[1:])
+            commands.append(['pkexec', 'bash', '-c', script])
+        elif system_packages:
+            commands.append(pkg_manager.uninstall_multiple(system_packages))
+        
+        if brew_packages:
+            # Homebrew no se puede ejecutar como root, va en una orden aparte
+            commands.append([BREW_PATH, 'uninstall'] + brew_packages)
+        return commands
+    
+    def uninstall_batch(self, items):
+        self.progress_bar.set_fraction(0.0)
+        self.progress_bar.set_visible(True)
+        self.batch_button.set_sensitive(False)
+        self.status_label.set_text(_("Desinstalando {} aplicaciones...").format(len(items)))
+        
+        commands = self.build_batch_uninstall_commands(items)
+        kinds = tuple(kind for kind in APP_KIND_ORDER if any(item.kind == kind for item in items))
+        
+        thread = threading.Thread(target=self.run_batch_uninstall, args=(commands, items, kinds))
+        thread.daemon = True
+        thread.start()
+    
+    def run_batch_uninstall(self, commands, items, kinds):
+        errors = []
+        for cmd in commands:
+            try:
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+                
+                while True:
+                    output = process.stdout.readline()
+                    if output == '' and process.poll() is not None:
+                        break
+                    if output:
+                        ui_bus.step(self.update_uninstall_progress)
+                
+                _, stderr = process.communicate()
+                if process.returncode != 0:
+                    errors.append(str(stderr))
+            except Exception as e:
+                errors.append(str(e))
+        
+        ui_bus.call(self.batch_uninstall_complete, items, kinds, errors)
+    
+    def batch_uninstall_complete(self, items, kinds, errors):
+        self.progress_bar.set_visible(False)
+        self.progress_bar.set_fraction(0.0)
+        
+        if not errors:
+            dialog = Adw.AlertDialog(
+                heading=_("Desinstalación completada"),
+                body=_("Se han desinstalado {} aplicaciones correctamente.").format(len(items))
+            )
+            self.status_label.set_text(_("Desinstalación completada"))
+        else:
+            dialog = Adw.AlertDialog(
+                heading=_("Error en la desinstalación"),
+                body=_("No se han podido desinstalar todas las aplicaciones.") + "\n\n" + "\n".join(errors)
+            )
+            self.status_label.set_text(_("Uy... ha habido un error cuando estaba desinstalándote la app"))
+        dialog.add_response("ok", _("OK"))
+        dialog.set_default_response("ok")
+        dialog.present(self)
+        
+        # Aplicar solo las diferencias: lo desinstalado sale de la lista y de la
+        # selección, y lo que haya fallado queda marcado para reintentarlo
+        self.update_batch_button()
+        self.refresh_apps_delta(kinds)
+        return False
+    
     # Desinstalar paquete
     def uninstall_package(self, package_name, is_appimage=False, is_brew=False, is_pwa=False):
         self.progress_bar.set_fraction(0.0)
@@ -2122,20 +4033,20 @@ class InstalledAppsWindow(Adw.Window):
                 if output == '' and process.poll() is not None:
                     break
                 if output:
-                    GLib.idle_add(self.update_uninstall_progress)
+                    ui_bus.step(self.update_uninstall_progress)
             
             _, stderr = process.communicate()
             
             if process.returncode == 0:
-                GLib.idle_add(self.uninstall_complete, package_name, True, is_appimage, is_brew, is_pwa)
+                ui_bus.call(self.uninstall_complete, package_name, True, is_appimage, is_brew, is_pwa)
             else:
-                GLib.idle_add(self.uninstall_complete, package_name, False, is_appimage, is_brew, is_pwa, str(stderr))
+                ui_bus.call(self.uninstall_complete, package_name, False, is_appimage, is_brew, is_pwa, str(stderr))
         except Exception as e:
-            GLib.idle_add(self.uninstall_complete, package_name, False, is_appimage, is_brew, is_pwa, str(e))
+            ui_bus.call(self.uninstall_complete, package_name, False, is_appimage, is_brew, is_pwa, str(e))
     
     # Barra de progreso de la desinstalación
-    def update_uninstall_progress(self):
-        new_value = min(1.0, self.progress_bar.get_fraction() + 0.05)
+    def update_uninstall_progress(self, steps=1):
+        new_value = min(1.0, self.progress_bar.get_fraction() + 0.05 * steps)
         self.progress_bar.set_fraction(new_value)
         return False
 
@@ -2180,7 +4091,20 @@ class InstalledAppsWindow(Adw.Window):
             self.status_label.set_text(_("Uy... ha habido un error cuando estaba desinstalándote la app"))
         
         dialog.present(self)
-        self.load_installed_apps()  # Refrescar la lista
+        
+        # Refrescar la lista quitando solo lo desinstalado
+        if success:
+            if is_appimage:
+                self.remove_app_item(package_name, "appimage")
+            elif is_pwa:
+                self.remove_app_item(package_name, "pwa")
+            elif is_brew:
+                self.remove_app_item(package_name, "brew")
+                self.refresh_apps_delta(("brew",))
+            else:
+                # El gestor puede haber quitado también paquetes dependientes
+                self.remove_app_item(package_name, "system")
+                self.refresh_apps_delta(("system",))
 
 
 class PWAConfigWindow(Adw.Window):
@@ -2707,6 +4631,21 @@ class PackageInstaller(Adw.ApplicationWindow):
 
         # Variables para búsqueda
         self.search_timer = None
+        self.search_session = SearchSession()
+        self.search_scheduler = SearchScheduler()
+        self.search_query = ""
+        self.search_results_by_source = {}
+        # Paquetes instalados, para dar prioridad a lo que ya conoce el usuario
+        self.installed_names = frozenset()
+        thread = threading.Thread(target=self.load_installed_names_thread)
+        thread.daemon = True
+        thread.start()
+        # Preparar el índice local de paquetes para que la búsqueda sea instantánea
+        if pkg_manager.index:
+            pkg_manager.index.refresh_async()
+        appstream_catalog.refresh_async()
+        if brew_index:
+            brew_index.refresh_async()
         # Sección de acciones
         actions_section = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=16)
         actions_section.add_css_class("card")
@@ -3195,8 +5134,8 @@ X-AppInstall=PWA
         except Exception as e:
             GLib.idle_add(self.fix_deps_complete, _(f"Error al corregir dependencias: {str(e)}"), True)
 
-    def update_progress(self):
-        new_value = min(1.0, self.progress_bar.get_fraction() + 0.01)
+    def update_progress(self, steps=1):
+        new_value = min(1.0, self.progress_bar.get_fraction() + 0.01 * steps)
         self.progress_bar.set_fraction(new_value)
         return False
 
@@ -3419,16 +5358,16 @@ X-AppInstall=PWA
                 if output == '' and process.poll() is not None:
                     break
                 if output:
-                    GLib.idle_add(self.update_progress)
+                    ui_bus.step(self.update_progress)
             
             _, stderr = process.communicate()
             
             if process.returncode == 0:
-                GLib.idle_add(self.auto_install_complete, packages, True)
+                ui_bus.call(self.auto_install_complete, packages, True)
             else:
-                GLib.idle_add(self.auto_install_complete, packages, False, stderr)
+                ui_bus.call(self.auto_install_complete, packages, False, stderr)
         except Exception as e:
-            GLib.idle_add(self.auto_install_complete, packages, False, str(e))
+            ui_bus.call(self.auto_install_complete, packages, False, str(e))
 
     def auto_install_complete(self, packages, success, error_msg=""):
         """Maneja el resultado de la instalación automática."""
@@ -3504,16 +5443,16 @@ X-AppInstall=PWA
                 if output == '' and process.poll() is not None:
                     break
                 if output:
-                    GLib.idle_add(self.update_progress)
+                    ui_bus.step(self.update_progress)
             
             _, stderr = process.communicate()
             
             if process.returncode == 0:
-                GLib.idle_add(self.auto_fix_complete, True)
+                ui_bus.call(self.auto_fix_complete, True)
             else:
-                GLib.idle_add(self.auto_fix_complete, False, stderr)
+                ui_bus.call(self.auto_fix_complete, False, stderr)
         except Exception as e:
-            GLib.idle_add(self.auto_fix_complete, False, str(e))
+            ui_bus.call(self.auto_fix_complete, False, str(e))
 
     def auto_fix_complete(self, success, error_msg=""):
         """Maneja el resultado de la corrección automática."""
@@ -3595,54 +5534,151 @@ X-AppInstall=PWA
         if len(text) >= 3:
             self.search_timer = GLib.timeout_add(500, self.perform_package_search, text)
         else:
+            # Descartar cualquier búsqueda que siga en curso
+            self.search_scheduler.cancel()
+            self.search_spinner.stop()
+            self.search_spinner.set_visible(False)
             self.search_results_scrolled.set_visible(False)
 
     def perform_package_search(self, query):
         self.search_timer = None
+        generation = self.search_scheduler.begin()
+        self.search_query = query
+        self.search_results_by_source = {}
         # Mostrar y activar spinner
         self.search_spinner.set_visible(True)
         self.search_spinner.start()
         # Ocultar resultados anteriores mientras busca
         self.search_results_scrolled.set_visible(False)
         
-        thread = threading.Thread(target=self.search_thread, args=(query,))
+        thread = threading.Thread(target=self.search_thread, args=(query, generation))
         thread.daemon = True
         thread.start()
         return False
 
-    def search_thread(self, query):
-        results = []
-
-        # Buscar usando el gestor de paquetes del sistema
+    def load_installed_names_thread(self):
         try:
-            results.extend(pkg_manager.search(query)[:15]) # Limitar resultados
-        except:
-            pass
-
-        # Buscar en Homebrew
+            installed = set(pkg_manager.list_installed())
+            if brew_metadata:
+                for names in brew_metadata.list_installed():
+                    installed.update(names)
+            self.installed_names = frozenset(installed)
+        except Exception as e:
+            print(f"Error al obtener paquetes instalados: {e}")
 
+    def get_search_backends(self):
+        """Orígenes de búsqueda como (origen, función, plazo máximo en segundos)."""
+        backends = [('system', pkg_manager.search, SEARCH_DEADLINES['system'])]
         if HAS_BREW:
-            print(f"DEBUG: Buscando '{query}' en Homebrew usando {BREW_PATH}")
-            try:
-                brew_output = subprocess.check_output([BREW_PATH, 'search', query], 
-                                                    timeout=10, stderr=subprocess.STDOUT).decode('utf-8')
-                found_count = 0
-                for line in brew_output.split('\n')[:15]:
-                    if line.strip() and not line.startswith('=='):
-                        results.append({'name': line.strip(), 'desc': _("Fórmula de Homebrew"), 'source': 'brew'})
-                        found_count += 1
-                print(f"DEBUG: Encontrados {found_count} resultados en Homebrew")
-            except Exception as e:
-                print(f"DEBUG: Error en búsqueda de Homebrew: {e}")
+            backends.append(('brew', brew_search, SEARCH_DEADLINES['brew']))
         else:
             print("DEBUG: Salto búsqueda de Homebrew (no detectado)")
-        
-        GLib.idle_add(self.show_search_results, results)
+        return backends
+
+    def search_thread(self, query, generation):
+        session = self.search_session
+        scheduler = self.search_scheduler
+
+        # Si la consulta amplía la anterior, basta con filtrar sus candidatos
+        candidates = session.narrow(query)
+        if candidates is not None:
+            ranked = rank_search_results(candidates, query)
+            by_source = {'system': [r for r in ranked if r['source'] != 'brew'],
+                         'brew': [r for r in ranked if r['source'] == 'brew']}
+            for source, results in by_source.items():
+                GLib.idle_add(self.add_search_results, generation, source,
+                              results[:SEARCH_CANDIDATE_LIMIT], source == 'brew')
+            return
 
-    def show_search_results(self, results):
-        # Detener y ocultar spinner
-        self.search_spinner.stop()
-        self.search_spinner.set_visible(False)
+        # Lanzar todos los orígenes a la vez y mostrar cada uno en cuanto termine
+        spawn = scheduler.spawner(generation)
+        backends = self.get_search_backends()
+        finished = queue.Queue()
+        processes = {}
+        deadlines = {}
+        for source, search_func, deadline in backends:
+            processes[source] = []
+            deadlines[source] = time.time() + deadline
+            thread = threading.Thread(target=self.search_backend_thread,
+                                      args=(source, search_func, query, spawn, processes[source], finished))
+            thread.daemon = True
+            thread.start()
+
+        candidates = []
+        complete = True
+        pending = set(deadlines)
+        while pending and scheduler.is_current(generation):
+            try:
+                source, results, source_complete = finished.get(timeout=max(0, min(deadlines[s] for s in pending) - time.time()))
+            except queue.Empty:
+                # Abandonar los orígenes que han superado su plazo
+                now = time.time()
+                for source in [s for s in pending if deadlines[s] <= now]:
+                    print(f"DEBUG: La búsqueda en {source} ha superado su plazo")
+                    for process in processes[source]:
+                        scheduler.terminate(process)
+                    pending.discard(source)
+                    complete = False
+                    GLib.idle_add(self.add_search_results, generation, source, [], not pending)
+                continue
+
+            if source not in pending:
+                continue
+            pending.discard(source)
+            if results is None:
+                complete = False
+                results = []
+            elif not source_complete:
+                # Búsqueda cortada en el límite: no sirve para filtrar consultas más largas
+                complete = False
+            candidates.extend(results)
+            # Los resultados del índice llegan ya ordenados y pueden ser miles:
+            # a la interfaz solo pasan los mejores
+            GLib.idle_add(self.add_search_results, generation, source,
+                          results[:SEARCH_CANDIDATE_LIMIT], not pending)
+
+        # Solo se reutilizan para filtrar búsquedas completas y vigentes; las
+        # del índice siempre lo son, así que "fire" -> "firef" no vuelve a buscar
+        if complete and scheduler.is_current(generation):
+            session.store(query, candidates)
+
+    def search_backend_thread(self, source, search_func, query, spawn, processes, finished):
+        """Ejecuta un origen de búsqueda y avisa al coordinador al terminar."""
+        def tracked_spawn(cmd, **kwargs):
+            process = spawn(cmd, **kwargs)
+            processes.append(process)
+            return process
+
+        try:
+            results, complete = search_func(query, tracked_spawn, SEARCH_CANDIDATE_LIMIT)
+            print(f"DEBUG: Encontrados {len(results)} resultados en {source}")
+        except SearchCancelled:
+            results, complete = None, False
+        except Exception as e:
+            print(f"DEBUG: Error en búsqueda de {source}: {e}")
+            results, complete = None, False
+        finished.put((source, results, complete))
+
+    def add_search_results(self, generation, source, results, finished):
+        """Añade los resultados de un origen a la lista mostrada."""
+        # Ignorar resultados de búsquedas ya superadas
+        if not self.search_scheduler.is_current(generation):
+            return False
+
+        # Ordenar todos los orígenes juntos antes de quedarnos con los mejores
+        self.search_results_by_source[source] = results
+        candidates = []
+        for key in ('system', 'brew'):
+            candidates.extend(self.search_results_by_source.get(key, []))
+        ranked = rank_search_results(candidates, self.search_query, self.installed_names)
+        self.show_search_results(ranked[:SEARCH_RESULT_LIMIT], finished)
+        return False
+
+    def show_search_results(self, results, finished=True):
+        if finished:
+            # Detener y ocultar spinner
+            self.search_spinner.stop()
+            self.search_spinner.set_visible(False)
         
         # Limpiar lista anterior
         child = self.search_results_list.get_first_child()
@@ -3662,17 +5698,25 @@ X-AppInstall=PWA
             box.set_margin_start(12)
             box.set_margin_end(12)
             
+            # Nombre, resumen e icono reales de la aplicación si están en AppStream
+            metadata = appstream_catalog.lookup(res['name']) if res['source'] != 'brew' else None
             icon_name = "package-x-generic-symbolic" if res['source'] == 'apt' else "system-software-install-symbolic"
-            icon = Gtk.Image.new_from_icon_name(icon_name)
-            icon.set_opacity(0.7)
+            icon = Gtk.Image()
+            set_appstream_icon(icon, metadata, icon_name)
+            if not metadata:
+                icon.set_opacity(0.7)
             box.append(icon)
             
             vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
-            name_label = Gtk.Label(label=res['name'], xalign=0)
+            name_label = Gtk.Label(label=metadata[0] if metadata else res['name'], xalign=0)
             name_label.add_css_class("title-label") 
             vbox.append(name_label)
             
-            desc_label = Gtk.Label(label=res['desc'], xalign=0)
+            desc = res['desc']
+            if metadata:
+                row.set_tooltip_text(res['name'])
+                desc = f"{res['name']} · {metadata[1] or desc}"
+            desc_label = Gtk.Label(label=desc, xalign=0)
             desc_label.set_ellipsize(3) # Pango.EllipsizeMode.END
             desc_label.add_css_class("subtitle-label")
             desc_label.set_opacity(0.8)
@@ -3715,11 +5759,9 @@ X-AppInstall=PWA
         # Intentar cargar icono local si no se encuentra en el tema
         local_icon = os.path.join(os.path.dirname(os.path.abspath(__file__)), "es.inled.AppInstall.png")
         if os.path.exists(local_icon):
-            try:
-                texture = Gdk.Texture.new_from_filename(local_icon)
+            texture = icon_cache.get_texture(local_icon)
+            if texture:
                 about_dialog.set_application_icon_paintable(texture)
-            except Exception as e:
-                print(f"No se pudo cargar el icono desde archivo: {e}")
                 
         about_dialog.present()
 def check_dependencies():